@@ -1,12 +1,6 @@
 #!/usr/bin/env python
 # Basic example of a stateful agent with memory management
 
-import sys
-import os
-
-# Add the parent directory to the path so we can import the package
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from stateful_agents import Agent, MemoryManager
 
 
@@ -28,6 +22,7 @@ def main():
     
     # Add default memory tools
     agent.tool_manager.add_memory_tools(memory_manager.core_memory)
+    agent.tool_manager.add_memory_search_tool(memory_manager)
     
     # Simulate a conversation
     print("\nSimulating a conversation with a stateful agent...\n")
@@ -1,19 +1,22 @@
 #!/usr/bin/env python
 # Demonstration of advanced memory management techniques in stateful agents
 
-import sys
-import os
+import argparse
+import functools
+import string
 import time
-from rich.console import Console
-from rich.panel import Panel
 
-# Add the parent directory to the path so we can import the package
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stateful_agents import Agent, MemoryManager, Tool, TokenEstimator
 
-from stateful_agents import Agent, MemoryManager, Tool
-
-# Initialize Rich console for prettier output
-console = Console()
+# Dashboard layout is fixed; only the numbers change between calls
+MEMORY_STATE_TEMPLATE = string.Template(
+    "[bold]Memory State[/bold]\n\n"
+    "Core Memory: $core_count blocks, $core_size chars\n"
+    "Recall Memory: $recall_count messages, $recall_size chars\n"
+    "Archival Memory: $archival_count items\n\n"
+    "Context Window Usage: $tokens tokens / $window tokens ($percent%)"
+)
+MEMORY_STATE_PANEL_OPTIONS = {"title": "Memory Dashboard", "border_style": "green"}
 
 
 def create_memory_tool(agent, name, description, function):
@@ -31,37 +34,62 @@ def create_memory_tool(agent, name, description, function):
     return tool
 
 
-def show_memory_state(memory_manager, context_window_size):
+def summarize_and_store(memory_manager, content):
+    """Store a short summary of the content in archival memory."""
+    return memory_manager.add_to_archival(f"SUMMARY: {content[:100]}...")
+
+
+def prioritize_memory(memory_manager, content):
+    """Move content out of the context window into archival memory."""
+    return memory_manager.add_to_archival(f"ARCHIVED: {content}")
+
+
+def show_memory_state(console, memory_manager, context_window_size, token_estimator):
     """Display the current state of memory and context window usage."""
+    from rich.panel import Panel
+    
     stats = memory_manager.get_memory_stats()
     
     total_core_size = stats["core_memory"]["total_size"]
     total_recall_size = stats["recall_memory"]["total_size"]
     
-    # Estimate total context window usage (this would be more accurate in a real implementation)
-    # We're assuming a rough approximation of characters to tokens
-    estimated_tokens = (total_core_size + total_recall_size) // 4  # Rough estimate: 4 chars ≈ 1 token
+    # Count context window usage with the model's tokenizer; only changed blocks are re-encoded
+    estimated_tokens = token_estimator.count_memory(memory_manager)["total"]
     window_percent = min(100, (estimated_tokens / context_window_size) * 100)
     
     console.print(Panel.fit(
-        f"[bold]Memory State[/bold]\n\n"
-        f"Core Memory: {stats['core_memory']['count']} blocks, {total_core_size} chars\n"
-        f"Recall Memory: {stats['recall_memory']['count']} messages, {total_recall_size} chars\n"
-        f"Archival Memory: {stats['archival_memory']['count']} items\n\n"
-        f"Estimated Context Window Usage: {estimated_tokens} tokens / {context_window_size} tokens "
-        f"({window_percent:.1f}%)",
-        title="Memory Dashboard",
-        border_style="green"
+        MEMORY_STATE_TEMPLATE.substitute(
+            core_count=stats["core_memory"]["count"],
+            core_size=total_core_size,
+            recall_count=stats["recall_memory"]["count"],
+            recall_size=total_recall_size,
+            archival_count=stats["archival_memory"]["count"],
+            tokens=estimated_tokens,
+            window=context_window_size,
+            percent=f"{window_percent:.1f}"
+        ),
+        **MEMORY_STATE_PANEL_OPTIONS
     ))
 
 
-def demonstrate_context_management():
-    """Demonstrate how memory management works with context windows."""
+def demonstrate_context_management(delay: float = 0.0):
+    """Demonstrate how memory management works with context windows.
+    
+    Args:
+        delay: Seconds to pause after each message so the output can be followed live
+    """
+    # Rich pulls in a large import chain, so only load it once the demo actually runs
+    from rich.console import Console
+    
+    # Initialize Rich console for prettier output
+    console = Console()
+    
     # Create a memory manager
     memory_manager = MemoryManager()
     
     # Define a small context window to better demonstrate management
     context_window_size = 4096  # tokens
+    token_estimator = TokenEstimator("gpt-4-turbo")
     
     # Create an agent with limited context window
     agent = Agent(
@@ -81,19 +109,19 @@ def demonstrate_context_management():
         agent,
         "summarize_and_store",
         "Summarize content and store in archival memory",
-        lambda content: memory_manager.add_to_archival(f"SUMMARY: {content[:100]}...")
+        functools.partial(summarize_and_store, memory_manager)
     )
     
     create_memory_tool(
         agent,
         "prioritize_memory",
         "Move less important information from core to archival memory",
-        lambda content: memory_manager.add_to_archival(f"ARCHIVED: {content}")
+        functools.partial(prioritize_memory, memory_manager)
     )
     
     # Show initial state
     console.print("\n[bold blue]Initial Memory State[/bold blue]")
-    show_memory_state(memory_manager, context_window_size)
+    show_memory_state(console, memory_manager, context_window_size, token_estimator)
     
     # Add core memories (important information)
     console.print("\n[bold blue]Adding Core Memories[/bold blue]")
@@ -102,7 +130,7 @@ def demonstrate_context_management():
     memory_manager.add_core_memory("current_project", "Alice is working on a web application for inventory management using React and Django.")
     
     # Show state after adding core memories
-    show_memory_state(memory_manager, context_window_size)
+    show_memory_state(console, memory_manager, context_window_size, token_estimator)
     
     # Simulate a conversation with multiple messages
     conversation = [
@@ -129,36 +157,22 @@ def demonstrate_context_management():
         console.print(f"[italic]User: {message}[/italic]")
         
         # Send message to agent
+        archived_before = memory_manager.archival_memory.count()
         response = agent.send_message(message)
         console.print(f"[italic]Agent: {response}[/italic]")
         
         # Show memory state after processing
-        show_memory_state(memory_manager, context_window_size)
-        
-        # If context window is getting full (over 70%), prompt for management
-        stats = memory_manager.get_memory_stats()
-        total_size = stats["core_memory"]["total_size"] + stats["recall_memory"]["total_size"]
-        estimated_tokens = total_size // 4
+        show_memory_state(console, memory_manager, context_window_size, token_estimator)
         
-        if estimated_tokens > (context_window_size * 0.7):
-            console.print("\n[bold yellow]Context window is filling up! Managing memory...[/bold yellow]")
-            
-            # Archive older conversation items
-            if i > 5:
-                oldest_messages = agent.memory_manager.recall_memory.get_by_range(0, 3)
-                for old_msg in oldest_messages:
-                    # Summarize and move to archival memory
-                    summary = f"User asked about: {old_msg.content[:50]}..."
-                    agent.memory_manager.add_to_archival(summary)
-                
-                # Remove from recall after archiving
-                agent.memory_manager.recall_memory.messages = agent.memory_manager.recall_memory.messages[3:]
-                
-                console.print("[yellow]Archived oldest conversation items to free up context window[/yellow]")
-                show_memory_state(memory_manager, context_window_size)
+        # The agent compacts its own context: when the conversation outgrows its token budget,
+        # the oldest messages are moved to archival memory before the LLM is called
+        if memory_manager.archival_memory.count() > archived_before:
+            console.print("\n[bold yellow]Context window was filling up! Agent archived its oldest messages.[/bold yellow]")
+            show_memory_state(console, memory_manager, context_window_size, token_estimator)
         
-        # Pause briefly for demo purposes
-        time.sleep(1)
+        # Optionally pause so the dashboard can be followed live
+        if delay:
+            time.sleep(delay)
     
     # Demonstrate retrieving information from archival memory
     console.print("\n[bold blue]Retrieving Information from Archival Memory[/bold blue]")
@@ -171,8 +185,16 @@ def demonstrate_context_management():
     
     # Final memory state
     console.print("\n[bold blue]Final Memory State[/bold blue]")
-    show_memory_state(memory_manager, context_window_size)
+    show_memory_state(console, memory_manager, context_window_size, token_estimator)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Demonstrate memory management in stateful agents")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to pause after each message (default: 0)")
+    args = parser.parse_args()
+    
+    demonstrate_context_management(delay=args.delay)
 
 
 if __name__ == "__main__":
-    demonstrate_context_management()
+    main()
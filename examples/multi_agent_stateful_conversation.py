@@ -1,25 +1,16 @@
 #!/usr/bin/env python
 # Example of stateful multi-agent conversation with memory persistence
 
-import sys
-import os
+import asyncio
 import time
-import uuid
-from rich.console import Console
-from rich.panel import Panel
 
-# Add the parent directory to the path so we can import the package
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stateful_agents import Server, AgentClient, AsyncAgentClient
 
-from stateful_agents import Agent, MemoryManager, Tool
-from stateful_agents.server import Server, AgentClient
 
-# Initialize Rich console for prettier output
-console = Console()
-
-
-def setup_agents(client):
+def setup_agents(client, console):
     """Create and configure the agents for the demo."""
+    from rich.panel import Panel
+    
     # Create a product manager agent
     pm_info = client.create_agent(
         name="ProductManager",
@@ -98,7 +89,16 @@ def setup_agents(client):
     return pm_id, dev_id, ux_id
 
 
-def facilitate_agent_conversation(client, pm_id, dev_id, ux_id):
+async def ask_agents_concurrently(base_url, questions):
+    """Send independent questions to several agents at once and return their responses in order."""
+    async with AsyncAgentClient(base_url=base_url) as async_client:
+        return await asyncio.gather(*[
+            async_client.send_message(agent_id, question)
+            for agent_id, _, question in questions
+        ])
+
+
+def facilitate_agent_conversation(client, console, pm_id, dev_id, ux_id):
     """Facilitate a conversation between the agents, demonstrating memory persistence."""
     
     # Initial message to PM from user
@@ -186,23 +186,20 @@ def facilitate_agent_conversation(client, pm_id, dev_id, ux_id):
     # Test if agents remember the updates
     console.print("[bold blue]Memory Persistence Test:[/bold blue]")
     
-    # Ask PM about the updated requirements
-    console.print("[bold]User to Product Manager:[/bold] Can you summarize the latest updates to our project requirements?")
-    
-    response = client.send_message(pm_id, "Can you summarize the latest updates to our project requirements?")
-    console.print(f"[bold]Product Manager:[/bold] {response['response']}\n")
-    
-    # Ask Developer how these changes affect the technical implementation
-    console.print("[bold]User to Developer:[/bold] How do these requirement changes affect our technical implementation?")
+    # Ask each agent about the updated requirements; the questions are independent, so send them concurrently
+    questions = [
+        (pm_id, "Product Manager", "Can you summarize the latest updates to our project requirements?"),
+        (dev_id, "Developer", "How do these requirement changes affect our technical implementation?"),
+        (ux_id, "UX Designer", "What design considerations arise from these new requirements?")
+    ]
     
-    response = client.send_message(dev_id, "How do these requirement changes affect our technical implementation?")
-    console.print(f"[bold]Developer:[/bold] {response['response']}\n")
+    for _, agent_name, question in questions:
+        console.print(f"[bold]User to {agent_name}:[/bold] {question}")
     
-    # Ask UX Designer about design implications
-    console.print("[bold]User to UX Designer:[/bold] What design considerations arise from these new requirements?")
+    responses = asyncio.run(ask_agents_concurrently(client.base_url, questions))
     
-    response = client.send_message(ux_id, "What design considerations arise from these new requirements?")
-    console.print(f"[bold]UX Designer:[/bold] {response['response']}\n")
+    for (_, agent_name, _), response in zip(questions, responses):
+        console.print(f"[bold]{agent_name}:[/bold] {response['response']}\n")
     
     # Final check on conversation memory
     console.print("[bold blue]Conversation Memory Test:[/bold blue]")
@@ -215,6 +212,13 @@ def facilitate_agent_conversation(client, pm_id, dev_id, ux_id):
 
 
 def main():
+    # Rich pulls in a large import chain, so only load it once the demo actually runs
+    from rich.console import Console
+    from rich.panel import Panel
+    
+    # Initialize Rich console for prettier output
+    console = Console()
+    
     # Start the server in a background thread
     server = Server(db_path="multi_agent_example.db")
     server_thread = server.run_in_thread(port=8080)
@@ -235,10 +239,10 @@ def main():
     
     try:
         # Set up the agents
-        pm_id, dev_id, ux_id = setup_agents(client)
+        pm_id, dev_id, ux_id = setup_agents(client, console)
         
         # Run through the conversation scenario
-        facilitate_agent_conversation(client, pm_id, dev_id, ux_id)
+        facilitate_agent_conversation(client, console, pm_id, dev_id, ux_id)
         
         console.print(Panel.fit(
             "The demonstration is complete. You've seen how stateful agents can:\n\n"
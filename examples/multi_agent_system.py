@@ -1,20 +1,14 @@
 #!/usr/bin/env python
 # Example of a multi-agent system with communication
 
-import sys
-import os
-import uuid
+import secrets
 
-# Add the parent directory to the path so we can import the package
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from stateful_agents import Agent, MemoryManager, Tool
-from stateful_agents.communication import Message
+from stateful_agents import Agent, MemoryManager, Tool, Message
 
 
 def create_agent(name, persona, model="gpt-4-turbo"):
     # Create a unique ID for the agent
-    agent_id = f"{name.lower()}-{uuid.uuid4().hex[:8]}"
+    agent_id = f"{name.lower()}-{secrets.token_hex(4)}"
     
     # Create a memory manager
     memory_manager = MemoryManager()
@@ -1,14 +1,9 @@
 #!/usr/bin/env python
 # Example of running the stateful agent server
 
-import sys
-import os
 import time
 
-# Add the parent directory to the path so we can import the package
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from stateful_agents.server import Server, AgentClient
+from stateful_agents import Server, AgentClient
 
 
 def main():
@@ -40,17 +35,17 @@ def main():
     client.update_core_memory(agent_id, "user_profile", "The user's name is Alice, she is a software engineer.")
     print("Added user profile to core memory")
     
-    # Send some messages
+    # Send some messages in a single request
     messages = [
         "Hello there, can you help me with a Python question?",
         "I need to parse a large JSON file efficiently. What's the best approach?",
         "Thanks for the advice! By the way, do you remember my name?"
     ]
     
-    for message in messages:
+    response = client.send_messages(agent_id, messages)
+    for message, reply in zip(messages, response["responses"]):
         print(f"\nUser: {message}")
-        response = client.send_message(agent_id, message)
-        print(f"Agent: {response['response']}")
+        print(f"Agent: {reply}")
     
     # Add to archival memory
     client.add_to_archival(
@@ -1,8 +1,18 @@
 from .agent import Agent
-from .memory import MemoryManager, CoreMemory, ArchivalMemory, RecallMemory
+from .memory import MemoryManager, CoreMemory, ArchivalMemory, RecallMemory, VectorIndex, FaissVectorIndex, RedisMemoryStore, SemanticCache
 from .tools import Tool, ToolManager
-from .communication import Message, CommunicationManager
-from .llm import LLMProvider, OpenAIProvider, AnthropicProvider
-from .server import Server, Database, AgentClient
+from .communication import Message, MessageType, Role, CommunicationManager
+from .llm import LLMProvider, OpenAIProvider, AnthropicProvider, ResponseCache
+from .tokens import TokenEstimator
 
 __version__ = "0.1.0"
+
+# The server stack (FastAPI, SQLite, HTTP clients) is only loaded when first used
+_LAZY_SERVER_EXPORTS = {"Server", "Database", "AgentClient", "AsyncAgentClient"}
+
+
+def __getattr__(name):
+    if name in _LAZY_SERVER_EXPORTS:
+        from . import server
+        return getattr(server, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,13 @@
-from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel, Field
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
+import asyncio
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from .memory import MemoryManager
 from .tools import ToolManager
-from .communication import CommunicationManager, Message
+from .communication import CommunicationManager, Message, Role
+from .communication.message import EMPTY_METADATA
+from .tokens import ContextBudget
 
 
 class Agent(BaseModel):
@@ -20,9 +24,28 @@ class Agent(BaseModel):
     context_window_limit: int = Field(4096, description="Maximum context window size in tokens")
     active: bool = Field(True, description="Whether the agent is active")
     reasoning_enabled: bool = Field(True, description="Whether to use explicit reasoning steps")
+    response_token_reserve: int = Field(1024, description="Tokens kept free in the context window for the response")
+    min_recent_messages: int = Field(2, description="Number of most recent messages that compaction never evicts")
+    llm_provider: Optional[Any] = Field(None, exclude=True, description="LLM provider used to generate responses")
+    stream_callback: Optional[Callable[[str], None]] = Field(None, exclude=True, description="Called with each piece of response text as it streams in")
+    memory_store: Optional[Any] = Field(None, exclude=True, description="Store such as RedisMemoryStore that save() and load() persist memory to")
+    total_token_budget: Optional[int] = Field(None, description="Maximum input plus output tokens the agent may spend in total")
+    total_input_token_count: int = Field(0, description="Input tokens spent on LLM calls so far")
+    total_output_token_count: int = Field(0, description="Output tokens generated by LLM calls so far")
     
-    class Config:
-        arbitrary_types_allowed = True
+    # System prompt rendered together with core memory, reused until core memory or the tools change,
+    # and the same prompt as (instructions, core memory) segments so providers can cache the stable one
+    _system_cache: Optional[str] = PrivateAttr(None)
+    _system_segments: Tuple[str, str] = PrivateAttr(("", ""))
+    _system_version: Optional[Tuple[int, Any]] = PrivateAttr(None)
+    # Base prompt plus memory instructions, which the tool instructions are appended to
+    _prompt_prefix: str = PrivateAttr("")
+    # Rendered tool instructions and the (tool manager, version) they were rendered for
+    _tool_instructions: Tuple[Any, str] = PrivateAttr((None, ""))
+    # Conversation turns in LLM message format, appended to as the conversation grows
+    _history: List[Dict[str, str]] = PrivateAttr(default_factory=list)
+    
+    model_config = ConfigDict(defer_build=True, arbitrary_types_allowed=True)
     
     def __init__(self, **data):
         """Initialize the agent with the given parameters."""
@@ -35,6 +58,9 @@ class Agent(BaseModel):
         if self.communication_manager is None:
             self.communication_manager = CommunicationManager(agent_id=self.id)
             
+        # Warm-start from persisted memory if a store is configured
+        self.load(self.id)
+        
         # Set up default memory blocks if not already present
         if not self.memory_manager.has_core_memory("persona"):
             self.memory_manager.add_core_memory("persona", self.persona)
@@ -42,6 +68,11 @@ class Agent(BaseModel):
         # Build the complete system prompt including memory management instructions
         self._build_system_prompt()
     
+    @property
+    def total_token_count(self) -> int:
+        """Get the total number of tokens spent on LLM calls so far."""
+        return self.total_input_token_count + self.total_output_token_count
+    
     def _build_system_prompt(self) -> None:
         """Build the complete system prompt including memory instructions."""
         base_prompt = self.system_prompt or self._get_default_system_prompt()
@@ -49,13 +80,28 @@ class Agent(BaseModel):
         # Add memory management instructions
         memory_instructions = self._get_memory_instructions()
         
-        # Add tool usage instructions if tools are available
-        tool_instructions = ""
-        if self.tool_manager and self.tool_manager.tools:
-            tool_instructions = self._get_tool_instructions()
+        # Combine all parts, with tool usage instructions if tools are available
+        self._prompt_prefix = f"{base_prompt}\n\n{memory_instructions}\n\n"
+        self.system_prompt = self._prompt_prefix + self._get_tool_instructions()
+    
+    def _get_system_context(self) -> str:
+        """Get the system prompt with core memory, re-rendering only when core memory or the tools changed."""
+        core_memory = self.memory_manager.core_memory
+        tool_instructions = self._get_tool_instructions()
+        version = (core_memory.version, self._tool_instructions[0])
+        if self._system_cache is None or self._system_version != version:
+            self.system_prompt = self._prompt_prefix + tool_instructions
+            self._system_segments = (self.system_prompt, self._render_core_memory(core_memory.blocks))
+            self._system_cache = "\n\n".join(self._system_segments)
+            self._system_version = version
         
-        # Combine all parts
-        self.system_prompt = f"{base_prompt}\n\n{memory_instructions}\n\n{tool_instructions}"
+        return self._system_cache
+    
+    def _render_core_memory(self, blocks: Dict[str, str]) -> str:
+        """Render the core memory blocks, which follow the system prompt."""
+        memory_blocks = "\n\n".join(f"[{key}]\n{value}" for key, value in blocks.items())
+        
+        return f"# Core Memory\n\n{memory_blocks}"
     
     def _get_default_system_prompt(self) -> str:
         """Get the default system prompt for the agent."""
@@ -79,7 +125,17 @@ class Agent(BaseModel):
         """
     
     def _get_tool_instructions(self) -> str:
-        """Get instructions for tool usage."""
+        """Get instructions for tool usage, re-rendering only when tools were registered."""
+        tool_manager = self.tool_manager
+        key = (id(tool_manager), tool_manager.version) if tool_manager else None
+        if key != self._tool_instructions[0]:
+            rendered = self._render_tool_instructions() if tool_manager and tool_manager.tools else ""
+            self._tool_instructions = (key, rendered)
+        
+        return self._tool_instructions[1]
+    
+    def _render_tool_instructions(self) -> str:
+        """Render instructions for tool usage."""
         tool_descriptions = "\n".join(
             [f"- {tool.name}: {tool.description}" for tool in self.tool_manager.tools]
         )
@@ -91,27 +147,60 @@ class Agent(BaseModel):
         {tool_descriptions}
         
         To use a tool, you must specify the tool name and parameters in your reasoning.
+        
+        {self.tool_manager.get_system_hint()}
         """
     
     def send_message(self, message: str, user_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> str:
-        """Send a message to the agent and get a response."""
+        """Send a message to the agent and get a response.
+        
+        Raises:
+            ValueError: If the call would exceed the agent's total token budget
+        """
+        context = self._begin_turn(message, user_id, metadata)
+        
+        # Call LLM with context
+        response = self._call_llm(context)
+        
+        return self._finish_turn(response, user_id)
+    
+    async def asend_message(self, message: str, user_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Send a message to the agent and get a response without blocking the event loop on the LLM call.
+        
+        Different agents can answer concurrently, but turns sent to the same agent must still be awaited one at a time.
+        
+        Raises:
+            ValueError: If the call would exceed the agent's total token budget
+        """
+        context = self._begin_turn(message, user_id, metadata)
+        response = await self._acall_llm(context)
+        return self._finish_turn(response, user_id)
+    
+    def _begin_turn(self, message: str, user_id: Optional[str], metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Record a user message and prepare the LLM context for answering it."""
+        # Refuse up front rather than paying for a call that would blow the budget
+        self._check_token_budget(message)
+        
         # Create a message object
         user_message = Message(
             content=message,
             sender_id=user_id or "user",
             receiver_id=self.id,
-            metadata=metadata or {}
+            metadata=metadata or EMPTY_METADATA
         )
         
-        # Store in recall memory
+        # Store in recall memory and extend the conversation history
         self.memory_manager.add_to_recall(user_message)
+        self._append_history(Role.USER, message)
         
-        # Generate context for LLM
-        context = self._prepare_context(user_message)
-        
-        # Call LLM with context
-        response = self._call_llm(context)
+        # Make room in the context window if the conversation has outgrown it
+        self._compact_context()
         
+        # Generate context for LLM
+        return self._prepare_context(user_message)
+    
+    def _finish_turn(self, response: str, user_id: Optional[str]) -> str:
+        """Process the LLM response and record it as the agent's reply."""
         # Parse response and handle any tool calls
         response = self._process_response(response)
         
@@ -122,9 +211,125 @@ class Agent(BaseModel):
             receiver_id=user_id or "user"
         )
         self.memory_manager.add_to_recall(agent_message)
+        self._append_history(Role.ASSISTANT, response)
         
         return response
     
+    def send_messages(self, messages: List[str], user_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Send several consecutive user turns to the agent and get a response to each.
+        
+        Turns are processed in order, so each response sees the turns before it.
+        """
+        return [self.send_message(message, user_id=user_id, metadata=metadata) for message in messages]
+    
+    def _append_history(self, role: str, content: str) -> None:
+        """Append a turn to the conversation history."""
+        self._history.append({"role": role, "content": content})
+        self._trim_history()
+    
+    def _trim_history(self) -> None:
+        """Drop history turns whose messages have left recall memory."""
+        overflow = len(self._history) - self.memory_manager.recall_memory.count()
+        if overflow > 0:
+            del self._history[:overflow]
+    
+    def _rebuild_history(self) -> None:
+        """Rebuild the conversation history from the messages in recall memory."""
+        self._history = [
+            {"role": Role.ASSISTANT if getattr(msg, "sender_id", None) == self.id else Role.USER,
+             "content": msg.content if hasattr(msg, "content") else str(msg)}
+            for msg in self.memory_manager.recall_memory.messages
+        ]
+    
+    def _check_token_budget(self, message: str) -> None:
+        """Raise if answering a message could take the agent past its total token budget."""
+        if self.total_token_budget is None:
+            return
+        
+        # The prompt can't outgrow the window, because compaction runs before every call
+        estimator = self.memory_manager.token_estimator
+        estimated_input = min(
+            estimator.count(self.system_prompt) + self.memory_manager.count_tokens()["total"] + estimator.count(message),
+            self.context_window_limit - self.response_token_reserve
+        )
+        
+        if self.total_token_count + estimated_input > self.total_token_budget:
+            raise ValueError(
+                f"Agent {self.id} would exceed its token budget of {self.total_token_budget} "
+                f"({self.total_token_count} used, ~{estimated_input} needed for the next call)"
+            )
+    
+    def _record_usage(self, context: Dict[str, Any], response: str, usage: Optional[Dict[str, int]] = None) -> None:
+        """Add an LLM call's token usage to the running totals, estimating it if the provider gave none."""
+        if usage:
+            self.total_input_token_count += usage.get("input_tokens", 0)
+            self.total_output_token_count += usage.get("output_tokens", 0)
+            return
+        
+        estimator = self.memory_manager.token_estimator
+        self.total_input_token_count += estimator.count(context["system_prompt"]) + sum(
+            estimator.count(turn["content"]) for turn in context["messages"]
+        )
+        self.total_output_token_count += estimator.count(response)
+    
+    def _compact_context(self) -> int:
+        """Evict just enough of the oldest messages for the conversation to fit its token budget.
+        
+        Evicted messages are archived together as a single passage.
+        
+        Returns:
+            The number of messages evicted
+        """
+        estimator = self.memory_manager.token_estimator
+        counts = self.memory_manager.count_tokens()
+        budget = ContextBudget.allocate(
+            total=self.context_window_limit,
+            system=estimator.count(self.system_prompt),
+            core=counts["core_memory"],
+            reserve=self.response_token_reserve
+        )
+        
+        excess = counts["recall_memory"] - budget.history_tokens
+        if excess <= 0:
+            return 0
+        
+        # Walk messages in the order recall memory's policy would evict them, never touching the most recent ones
+        recall_memory = self.memory_manager.recall_memory
+        to_evict = 0
+        for msg in recall_memory.eviction_order(protect_recent=self.min_recent_messages):
+            if excess <= 0:
+                break
+            excess -= estimator.count(msg.content if hasattr(msg, "content") else str(msg))
+            to_evict += 1
+        
+        if to_evict == 0:
+            return 0
+        
+        evicted = recall_memory.evict(to_evict, protect_recent=self.min_recent_messages)
+        # The history must start with a user turn (Anthropic rejects a leading assistant one),
+        # so also evict an assistant reply left at the front
+        while recall_memory.count() > self.min_recent_messages:
+            first = recall_memory.messages[0]
+            if getattr(first, "sender_id", None) != self.id:
+                break
+            evicted.extend(recall_memory.evict_oldest(1))
+        if recall_memory.policy == "lru":
+            self._trim_history()
+        else:
+            # Eviction may have left gaps in the conversation, so rebuild it from what remains
+            self._rebuild_history()
+        
+        transcript = "\n".join(
+            f"{msg.sender_id}: {msg.content}" if hasattr(msg, "content") else str(msg)
+            for msg in evicted
+        )
+        self.memory_manager.add_to_archival(
+            transcript,
+            {"source": "context_compaction", "message_count": len(evicted)}
+        )
+        
+        return len(evicted)
+    
     def _prepare_context(self, message: Message) -> Dict[str, Any]:
         """Prepare the context for the LLM."""
         # This would include:
@@ -136,18 +341,72 @@ class Agent(BaseModel):
         
         # For now, return a placeholder
         return {
-            "system_prompt": self.system_prompt,
-            "core_memory": self.memory_manager.get_all_core_memory(),
-            "recall_memory": self.memory_manager.get_relevant_recall(message.content),
-            "tools": self.tool_manager.get_tool_schemas() if self.tool_manager else [],
-            "current_message": message.dict()
+            "system_prompt": self._get_system_context(),
+            "system_segments": list(self._system_segments),
+            "messages": self._history,
+            "core_memory": self.memory_manager.get_core_memory_view(),
+            # Not promoted under 2Q: this lookup always matches the message just added, so it would
+            # mark every user turn as referenced and leave only assistant replies to evict
+            "recall_memory": self.memory_manager.get_relevant_recall(message.content, promote=False),
+            "tools": self.tool_manager.get_tool_schemas(message.content) if self.tool_manager else [],
+            "current_message": msgspec.structs.asdict(message)
         }
     
+    def _llm_request(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the provider generate() arguments for a context."""
+        # The instructions and core memory go separately, so a provider with prompt caching keeps
+        # the instructions cached across core memory edits. Retrieved memory is never added here;
+        # it only reaches the model as memory_search results, so the prefix stays stable
+        return {
+            "messages": context["messages"],
+            "system_prompt": context["system_segments"],
+            "max_tokens": self.response_token_reserve,
+            "model": self.model
+        }
+    
+    def _placeholder_response(self, context: Dict[str, Any]) -> str:
+        """Return a placeholder response, used when no provider is configured."""
+        response = "This is a placeholder response. Actual LLM integration will be implemented later."
+        self._record_usage(context, response)
+        return response
+    
     def _call_llm(self, context: Dict[str, Any]) -> str:
-        """Call the LLM with the given context."""
-        # This would make the actual API call to the LLM provider
-        # For now, return a placeholder response
-        return "This is a placeholder response. Actual LLM integration will be implemented later."
+        """Call the LLM with the given context and record its token usage."""
+        if self.llm_provider is None:
+            return self._placeholder_response(context)
+        
+        request = self._llm_request(context)
+        
+        if self.stream_callback is not None and hasattr(self.llm_provider, "generate_stream"):
+            # Hand text on as it arrives rather than waiting for the whole response
+            for event in self.llm_provider.generate_stream(**request):
+                if event["type"] == "text":
+                    self.stream_callback(event["content"])
+                else:
+                    result = event
+        else:
+            result = self.llm_provider.generate(**request)
+        
+        response = result["content"]
+        self._record_usage(context, response, result.get("usage"))
+        return response
+    
+    async def _acall_llm(self, context: Dict[str, Any]) -> str:
+        """Call the LLM asynchronously with the given context and record its token usage."""
+        if self.llm_provider is None:
+            return self._placeholder_response(context)
+        
+        request = self._llm_request(context)
+        
+        if hasattr(self.llm_provider, "agenerate"):
+            result = await self.llm_provider.agenerate(**request)
+        else:
+            # Providers without an async API run in a worker thread so the event loop stays free
+            result = await asyncio.to_thread(self.llm_provider.generate, **request)
+        
+        response = result["content"]
+        self._record_usage(context, response, result.get("usage"))
+        return response
     
     def _process_response(self, response: str) -> str:
         """Process the LLM response, handling any tool calls."""
@@ -156,11 +415,16 @@ class Agent(BaseModel):
         return response
     
     def save(self) -> None:
-        """Save the agent's state to persistence."""
-        # This would save the agent's state to the database
-        pass
+        """Save the agent's core and recall memory to the memory store, if one is configured."""
+        if self.memory_store is None:
+            return
+        
+        self.memory_store.save(self.id, self.memory_manager)
     
     def load(self, agent_id: str) -> None:
-        """Load the agent's state from persistence."""
-        # This would load the agent's state from the database
-        pass
+        """Load an agent's core and recall memory from the memory store, if one is configured."""
+        if self.memory_store is None:
+            return
+        
+        if self.memory_store.load(agent_id, self.memory_manager):
+            self._rebuild_history()
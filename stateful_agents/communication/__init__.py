@@ -1,2 +1,2 @@
-from .message import Message
+from .message import Message, MessageType, Role
 from .communication_manager import CommunicationManager
@@ -1,47 +1,80 @@
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Deque, Dict, List, Optional, Any
+from collections import deque
+import asyncio
+import msgspec
 
-from .message import Message
+from .message import Message, MessageType
 
 
-class CommunicationManager(BaseModel):
+class CommunicationManager(msgspec.Struct):
     """Manages communication between agents."""
     
     agent_id: str
-    message_queue: List[Message] = Field(default_factory=list)
-    max_queue_size: int = Field(100, description="Maximum number of messages to keep in queue")
+    message_queue: Deque[Message] = msgspec.field(default_factory=deque)
+    max_queue_size: int = 100  # Maximum number of messages to keep in queue
     
-    def send_message(self, receiver_id: str, content: str, message_type: str = "text", metadata: Optional[Dict[str, Any]] = None) -> Message:
+    def __post_init__(self):
+        """Bound the message queue to max_queue_size."""
+        # Once full, each new message pushes out the oldest in O(1)
+        self.message_queue = deque(self.message_queue, maxlen=self.max_queue_size)
+    
+    def send_message(self, receiver_id: str, content: str, message_type: str = MessageType.TEXT, metadata: Optional[Dict[str, Any]] = None) -> Message:
         """Send a message to another agent."""
-        message = Message(
+        message = Message.acquire(
             content=content,
             sender_id=self.agent_id,
             receiver_id=receiver_id,
             message_type=message_type,
-            metadata=metadata or {}
+            metadata=metadata
         )
         
         # In a real implementation, this would send the message to the receiver
         # For now, just return the message
         return message
     
+    async def broadcast(self, agents: List[Any], content: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Send a message from this agent to several agents and collect their responses.
+        
+        The agents answer concurrently, so the broadcast takes about as long as the slowest one.
+        
+        Args:
+            agents: Agents to send the message to
+            content: Content of the message
+            metadata: Optional metadata attached to each agent's copy of the message
+            
+        Returns:
+            Each agent's response, keyed by agent ID
+        """
+        responses = await asyncio.gather(*(
+            agent.asend_message(content, user_id=self.agent_id, metadata=metadata) for agent in agents
+        ))
+        return {agent.id: response for agent, response in zip(agents, responses)}
+    
     def receive_message(self, message: Message) -> None:
         """Receive a message from another agent or user."""
         if message.receiver_id != self.agent_id:
             raise ValueError(f"Message not for this agent. Expected {self.agent_id}, got {message.receiver_id}")
         
+        # A full queue drops its oldest message. It is not returned to the Message pool, since
+        # the sender (and anyone else it was handed to) may still hold it
         self.message_queue.append(message)
-        
-        # Trim queue if necessary
-        if len(self.message_queue) > self.max_queue_size:
-            self.message_queue = self.message_queue[-self.max_queue_size:]
     
     def get_pending_messages(self) -> List[Message]:
         """Get all pending messages."""
-        messages = self.message_queue.copy()
+        messages = list(self.message_queue)
         self.message_queue.clear()
         return messages
     
+    def release_messages(self, messages: List[Message]) -> None:
+        """Return handled messages to the Message pool.
+        
+        The manager never releases messages by itself, because it does not own them exclusively.
+        Calling this transfers the messages to the pool: only call it when nothing else holds them,
+        neither the sender, recall memory, nor another recipient, and do not use them afterwards.
+        """
+        for message in messages:
+            Message.release(message)
+    
     def has_pending_messages(self) -> bool:
         """Check if there are pending messages."""
         return len(self.message_queue) > 0
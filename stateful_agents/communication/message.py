@@ -1,14 +1,97 @@
-from typing import Dict, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any
+from enum import Enum
 import time
-from pydantic import BaseModel, Field
+import msgspec
 
 
-class Message(BaseModel):
+class Role(str, Enum):
+    """Role of a turn in an LLM conversation."""
+    
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+    
+    def __str__(self) -> str:
+        return self.value
+
+
+class MessageType(str, Enum):
+    """Type of a message between agents."""
+    
+    TEXT = "text"
+    TOOL = "tool_call"
+    
+    def __str__(self) -> str:
+        return self.value
+
+
+class _EmptyMetadata(dict):
+    """Read-only empty metadata shared by every message created without any."""
+    
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Message metadata is shared and read-only when empty; assign a new dict instead")
+    
+    __setitem__ = __delitem__ = __ior__ = setdefault = update = pop = popitem = clear = _read_only
+    
+    def __reduce__(self) -> str:
+        # Unpickle and copy to the shared instance rather than a new one
+        return "EMPTY_METADATA"
+
+
+EMPTY_METADATA: Mapping[str, Any] = _EmptyMetadata()
+
+
+class Message(msgspec.Struct):
     """A message between agents or between an agent and a user."""
     
-    content: str = Field(..., description="Content of the message")
-    sender_id: str = Field(..., description="ID of the sender")
-    receiver_id: str = Field(..., description="ID of the receiver")
-    timestamp: float = Field(default_factory=time.time, description="Timestamp of the message")
-    message_type: str = Field("text", description="Type of message")
-    metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
+    content: str  # Content of the message
+    sender_id: str  # ID of the sender
+    receiver_id: str  # ID of the receiver
+    timestamp: int = msgspec.field(default_factory=time.time_ns)  # Timestamp of the message in nanoseconds since the epoch
+    message_type: str = MessageType.TEXT  # Type of message
+    metadata: Mapping[str, Any] = EMPTY_METADATA  # Additional metadata
+    
+    @classmethod
+    def acquire(cls,
+                content: str,
+                sender_id: str,
+                receiver_id: str,
+                timestamp: Optional[int] = None,
+                message_type: str = MessageType.TEXT,
+                metadata: Optional[Dict[str, Any]] = None) -> "Message":
+        """Get a message, reusing a released instance when one is available."""
+        # A single pop() rather than a check then a pop, since several threads may share the pool
+        try:
+            message = _MESSAGE_POOL.pop()
+        except IndexError:
+            return cls(
+                content=content,
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                timestamp=time.time_ns() if timestamp is None else timestamp,
+                message_type=message_type,
+                metadata=EMPTY_METADATA if metadata is None else metadata
+            )
+        
+        message.content = content
+        message.sender_id = sender_id
+        message.receiver_id = receiver_id
+        message.timestamp = time.time_ns() if timestamp is None else timestamp
+        message.message_type = message_type
+        message.metadata = EMPTY_METADATA if metadata is None else metadata
+        return message
+    
+    @staticmethod
+    def release(message: "Message") -> None:
+        """Return a message to the pool. The caller must not use it afterwards."""
+        if len(_MESSAGE_POOL) < MESSAGE_POOL_SIZE:
+            # Drop references so pooled messages do not keep content alive
+            message.content = ""
+            message.metadata = EMPTY_METADATA
+            _MESSAGE_POOL.append(message)
+
+
+# Maximum number of released messages kept for reuse
+MESSAGE_POOL_SIZE = 1024
+
+_MESSAGE_POOL: List[Message] = []
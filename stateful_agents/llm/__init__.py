@@ -1,3 +1,4 @@
 from .provider import LLMProvider
 from .openai_provider import OpenAIProvider
 from .anthropic_provider import AnthropicProvider
+from .response_cache import ResponseCache
@@ -1,8 +1,14 @@
-from typing import Dict, List, Optional, Any, Union
-import json
+from typing import Dict, Iterator, List, Optional, Any, Union
+from functools import lru_cache
 import anthropic
+import orjson
 
 from .provider import LLMProvider
+from .response_cache import ResponseCache
+from ..communication.message import Role
+
+# Anthropic has no system role, so every non-assistant turn is sent as a user turn
+_ROLE_MAP = {"assistant": Role.ASSISTANT, "user": Role.USER}
 
 
 class AnthropicProvider(LLMProvider):
@@ -17,35 +23,79 @@ class AnthropicProvider(LLMProvider):
         "claude-instant-1.2": 100000
     }
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[ResponseCache] = None):
         """Initialize the Anthropic provider.
         
         Args:
             api_key: Anthropic API key (uses environment variable if not provided)
+            cache: Response cache consulted before each generate() call (optional)
         """
         client_kwargs = {}
         if api_key:
             client_kwargs["api_key"] = api_key
         
         self.client = anthropic.Anthropic(**client_kwargs)
+        self._client_kwargs = client_kwargs
+        self._async_client = None
+        self.cache = cache
+        
+        # Each text is counted once, so a growing conversation only pays for its new turns
+        self._count_text = lru_cache(maxsize=4096)(self._count_text_uncached)
+    
+    @property
+    def async_client(self) -> "anthropic.AsyncAnthropic":
+        """Get the async API client, created on first use."""
+        if self._async_client is None:
+            self._async_client = anthropic.AsyncAnthropic(**self._client_kwargs)
+        return self._async_client
+    
+    @property
+    def cache_enabled(self) -> bool:
+        """Whether generate() consults a response cache."""
+        return self.cache is not None
+    
+    def _count_text_uncached(self, text: str) -> int:
+        return self.client.count_tokens(text)
     
     def count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text string."""
-        return self.client.count_tokens(text)
+        return self._count_text(text)
     
-    def count_message_tokens(self, messages: List[Dict[str, str]], system_prompt: str) -> int:
+    def count_message_tokens(self, messages: List[Dict[str, str]], system_prompt: Union[str, List[str]]) -> int:
         """Count the number of tokens in a message list plus system prompt."""
-        # Convert to Anthropic message format
-        anthropic_messages = [
-            {"role": "system", "content": system_prompt}
+        segments = [system_prompt] if isinstance(system_prompt, str) else system_prompt
+        return sum(map(self._count_text, segments)) + sum(self._count_text(msg["content"]) for msg in messages)
+    
+    @staticmethod
+    def _convert_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Convert messages to Anthropic message format, passing them through untouched if they already are.
+        
+        The system prompt is not a message role in the Anthropic API; it goes in the top-level system parameter.
+        """
+        if all(msg["role"] in _ROLE_MAP and len(msg) == 2 for msg in messages):
+            return messages
+        
+        return [
+            {"role": _ROLE_MAP.get(msg["role"], Role.USER), "content": msg["content"]}
+            for msg in messages
         ]
+    
+    @staticmethod
+    def _system_param(system_prompt: Union[str, List[str]]) -> Union[str, List[Dict[str, Any]]]:
+        """Build the system parameter, marking each segment of a segmented system prompt as cacheable.
         
-        for msg in messages:
-            role = "assistant" if msg["role"] == "assistant" else "user"
-            anthropic_messages.append({"role": role, "content": msg["content"]})
+        A system prompt given as a list of segments, most stable first (at most four, the API's
+        limit on cache breakpoints), becomes one text block per segment with a cache_control
+        marker. Each turn then reuses the cached prefix up to the first segment that changed,
+        for example the instructions when only core memory was edited.
+        """
+        if isinstance(system_prompt, str):
+            return system_prompt
         
-        # Calculate tokens using Anthropic's helper
-        return self.client.count_tokens(anthropic_messages)
+        return [
+            {"type": "text", "text": segment, "cache_control": {"type": "ephemeral"}}
+            for segment in system_prompt if segment
+        ]
     
     def get_max_context_size(self, model: str) -> int:
         """Get the maximum context size for a given model."""
@@ -55,23 +105,14 @@ class AnthropicProvider(LLMProvider):
         # Default context size for unknown models (Claude models have large context)
         return 100000
     
-    def generate(self, 
-                messages: List[Dict[str, str]], 
-                system_prompt: str, 
-                tools: Optional[List[Dict[str, Any]]] = None, 
-                max_tokens: Optional[int] = None,
-                temperature: float = 0.7,
-                model: str = "claude-3-sonnet-20240229") -> Dict[str, Any]:
-        """Generate a response from the Anthropic API."""
-        # Convert to Anthropic message format
-        anthropic_messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
-        for msg in messages:
-            role = "assistant" if msg["role"] == "assistant" else "user"
-            anthropic_messages.append({"role": role, "content": msg["content"]})
-        
+    def _prepare_params(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]],
+                        max_tokens: Optional[int],
+                        temperature: float,
+                        model: str) -> Dict[str, Any]:
+        """Check the context window and build the message creation parameters."""
         # Check if messages fit in context window
         if not self.fits_in_context(messages, system_prompt, model):
             overflow = self.get_context_overflow(messages, system_prompt, model)
@@ -80,7 +121,8 @@ class AnthropicProvider(LLMProvider):
         # Prepare API call parameters
         params = {
             "model": model,
-            "messages": anthropic_messages,
+            "system": self._system_param(system_prompt),
+            "messages": self._convert_messages(messages),
             "temperature": temperature,
         }
         
@@ -90,33 +132,165 @@ class AnthropicProvider(LLMProvider):
         if tools:
             params["tools"] = tools
         
+        return params
+    
+    def generate(self, 
+                messages: List[Dict[str, str]], 
+                system_prompt: Union[str, List[str]], 
+                tools: Optional[List[Dict[str, Any]]] = None, 
+                max_tokens: Optional[int] = None,
+                temperature: float = 0.7,
+                model: str = "claude-3-sonnet-20240229") -> Dict[str, Any]:
+        """Generate a response from the Anthropic API, or from the response cache if one is configured."""
+        request = {
+            "messages": messages,
+            "system_prompt": system_prompt,
+            "tools": tools,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model
+        }
+        cached = self._cached_result(request)
+        if cached is not None:
+            return cached
+        
+        params = self._prepare_params(**request)
+        
         # Make the API call
         try:
             response = self.client.messages.create(**params)
+            return self._build_result(request, response)
+            
+        except Exception as e:
+            error_msg = str(e)
+            raise RuntimeError(f"Error calling Anthropic API: {error_msg}")
+    
+    async def agenerate(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]] = None,
+                        max_tokens: Optional[int] = None,
+                        temperature: float = 0.7,
+                        model: str = "claude-3-sonnet-20240229") -> Dict[str, Any]:
+        """Generate a response like generate(), without blocking the event loop while waiting on the API."""
+        request = {
+            "messages": messages,
+            "system_prompt": system_prompt,
+            "tools": tools,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model
+        }
+        cached = self._cached_result(request)
+        if cached is not None:
+            return cached
+        
+        params = self._prepare_params(**request)
+        
+        try:
+            response = await self.async_client.messages.create(**params)
+            return self._build_result(request, response)
+            
+        except Exception as e:
+            error_msg = str(e)
+            raise RuntimeError(f"Error calling Anthropic API: {error_msg}")
+    
+    def _cached_result(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look a request up in the response cache, if one is configured."""
+        if self.cache is None:
+            return None
+        
+        cached = self.cache.get(request)
+        if cached is None:
+            return None
+        
+        # Answered without an API call, so no tokens were spent
+        return {**cached, "usage": {"input_tokens": 0, "output_tokens": 0}, "cached": True}
+    
+    def _build_result(self, request: Dict[str, Any], response: Any) -> Dict[str, Any]:
+        """Convert an API response to a result dict, caching it if a response cache is configured."""
+        # Process the response
+        result = {
+            "content": response.content[0].text,
+            "model": response.model,
+            "stop_reason": response.stop_reason,
+            "usage": {
+                "input_tokens": response.usage.input_tokens,
+                "output_tokens": response.usage.output_tokens
+            }
+        }
+        
+        # Handle tool calls if present
+        if hasattr(response, "tool_use") and response.tool_use:
+            tool_calls = []
+            for tool_use in response.tool_use:
+                tool_calls.append({
+                    "id": tool_use.id if hasattr(tool_use, "id") else "tool-call",
+                    "type": "function",
+                    "function": {
+                        "name": tool_use.name,
+                        "arguments": tool_use.input
+                    }
+                })
+            
+            result["tool_calls"] = tool_calls
+        
+        if self.cache is not None:
+            self.cache.put(request, result)
+        
+        return result
+    
+    def generate_stream(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]] = None,
+                        max_tokens: Optional[int] = None,
+                        temperature: float = 0.7,
+                        model: str = "claude-3-sonnet-20240229") -> Iterator[Dict[str, Any]]:
+        """Stream a response from the Anthropic API.
+        
+        Yields:
+            {"type": "text", "content": ...} for each piece of text as it arrives, then one
+            {"type": "done", ...} event carrying the same fields as generate()'s result
+        """
+        params = self._prepare_params(messages, system_prompt, tools, max_tokens, temperature, model)
+        
+        try:
+            with self.client.messages.stream(**params) as stream:
+                content = []
+                for text in stream.text_stream:
+                    content.append(text)
+                    yield {"type": "text", "content": text}
+                
+                response = stream.get_final_message()
             
-            # Process the response
             result = {
-                "content": response.content[0].text,
+                "type": "done",
+                "content": "".join(content),
                 "model": response.model,
                 "stop_reason": response.stop_reason,
+                "usage": {
+                    "input_tokens": response.usage.input_tokens,
+                    "output_tokens": response.usage.output_tokens
+                }
             }
             
-            # Handle tool calls if present
-            if hasattr(response, "tool_use") and response.tool_use:
-                tool_calls = []
-                for tool_use in response.tool_use:
-                    tool_calls.append({
-                        "id": tool_use.id if hasattr(tool_use, "id") else "tool-call",
-                        "type": "function",
-                        "function": {
-                            "name": tool_use.name,
-                            "arguments": tool_use.input
-                        }
-                    })
-                
+            # Tool calls arrive as complete tool_use blocks in the final message
+            tool_calls = [
+                {
+                    "id": block.id,
+                    "type": "function",
+                    "function": {
+                        "name": block.name,
+                        "arguments": block.input
+                    }
+                }
+                for block in response.content if block.type == "tool_use"
+            ]
+            if tool_calls:
                 result["tool_calls"] = tool_calls
             
-            return result
+            yield result
             
         except Exception as e:
             error_msg = str(e)
@@ -124,24 +298,16 @@ class AnthropicProvider(LLMProvider):
     
     def generate_with_structured_response(self,
                                          messages: List[Dict[str, str]],
-                                         system_prompt: str,
+                                         system_prompt: Union[str, List[str]],
                                          response_schema: Dict[str, Any],
                                          model: str = "claude-3-sonnet-20240229",
                                          temperature: float = 0.7) -> Dict[str, Any]:
         """Generate a response that conforms to a specific JSON schema."""
-        # Convert to Anthropic message format
-        anthropic_messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
-        for msg in messages:
-            role = "assistant" if msg["role"] == "assistant" else "user"
-            anthropic_messages.append({"role": role, "content": msg["content"]})
-        
         # Prepare API call parameters
         params = {
             "model": model,
-            "messages": anthropic_messages,
+            "system": self._system_param(system_prompt),
+            "messages": self._convert_messages(messages),
             "temperature": temperature,
             "response_format": {"type": "json_object", "schema": response_schema}
         }
@@ -151,7 +317,7 @@ class AnthropicProvider(LLMProvider):
             
             # Parse JSON response
             content = response.content[0].text
-            parsed_response = json.loads(content)
+            parsed_response = orjson.loads(content)
             
             result = {
                 "content": parsed_response,
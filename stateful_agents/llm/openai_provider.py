@@ -1,9 +1,27 @@
-from typing import Dict, List, Optional, Any, Union
-import json
-import tiktoken
+from typing import Dict, Iterator, List, Optional, Any, Union
+from functools import lru_cache
 import openai
+import orjson
 
 from .provider import LLMProvider
+from .response_cache import ResponseCache
+from ..communication.message import Role
+from ..tokens import TokenLengthCache, get_encoding
+
+
+def _system_text(system_prompt: Union[str, List[str]]) -> str:
+    """Join a system prompt given as segments, most stable first, into one string.
+
+    OpenAI caches matching prompt prefixes automatically, so the segments need no markers.
+    """
+    return system_prompt if isinstance(system_prompt, str) else "\n\n".join(system_prompt)
+
+
+@lru_cache(maxsize=None)
+def _token_lengths(model: str) -> TokenLengthCache:
+    """Get the process-wide token length cache for a model."""
+    # Long texts are counted but not pinned in the cache
+    return TokenLengthCache(get_encoding(model), maxsize=4096, max_text_length=16384)
 
 
 class OpenAIProvider(LLMProvider):
@@ -19,12 +37,13 @@ class OpenAIProvider(LLMProvider):
         "gpt-3.5-turbo-16k": 16385
     }
     
-    def __init__(self, api_key: Optional[str] = None, organization: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, organization: Optional[str] = None, cache: Optional[ResponseCache] = None):
         """Initialize the OpenAI provider.
         
         Args:
             api_key: OpenAI API key (uses environment variable if not provided)
             organization: OpenAI organization ID (optional)
+            cache: Response cache consulted before each generate() call (optional)
         """
         client_kwargs = {}
         if api_key:
@@ -33,42 +52,59 @@ class OpenAIProvider(LLMProvider):
             client_kwargs["organization"] = organization
         
         self.client = openai.OpenAI(**client_kwargs)
-        self.encoders = {}
+        self._client_kwargs = client_kwargs
+        self._async_client = None
+        self.cache = cache
+        
+        # Token count of the last system prompt seen, which rarely changes between calls
+        self._system_prompt_tokens = (None, None, 0)
+    
+    @property
+    def async_client(self) -> "openai.AsyncOpenAI":
+        """Get the async API client, created on first use."""
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(**self._client_kwargs)
+        return self._async_client
+    
+    @property
+    def cache_enabled(self) -> bool:
+        """Whether generate() consults a response cache."""
+        return self.cache is not None
     
     def _get_encoder(self, model: str):
-        """Get the appropriate token encoder for a model."""
-        if model not in self.encoders:
-            try:
-                self.encoders[model] = tiktoken.encoding_for_model(model)
-            except KeyError:
-                # Fall back to cl100k_base for new models not yet in tiktoken
-                self.encoders[model] = tiktoken.get_encoding("cl100k_base")
-        
-        return self.encoders[model]
+        """Get the appropriate token encoder for a model, shared process-wide."""
+        return get_encoding(model)
     
     def count_tokens(self, text: str, model: str = "gpt-4-turbo") -> int:
         """Count the number of tokens in a text string."""
-        encoder = self._get_encoder(model)
-        return len(encoder.encode(text))
+        return _token_lengths(model).count(text)
     
-    def count_message_tokens(self, messages: List[Dict[str, str]], system_prompt: str, model: str = "gpt-4-turbo") -> int:
+    def _count_system_prompt_tokens(self, system_prompt: str, model: str) -> int:
+        """Count the tokens in a system prompt, reusing the count while the prompt is unchanged."""
+        cached_model, cached_prompt, tokens = self._system_prompt_tokens
+        if cached_model != model or cached_prompt != system_prompt:
+            tokens = len(self._get_encoder(model).encode(system_prompt))
+            self._system_prompt_tokens = (model, system_prompt, tokens)
+        return tokens
+    
+    def count_message_tokens(self, messages: List[Dict[str, str]], system_prompt: Union[str, List[str]], model: str = "gpt-4-turbo") -> int:
         """Count the number of tokens in a message list plus system prompt."""
-        # Create a copy of messages with system prompt prepended
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
-        
         # Count tokens according to OpenAI's method
-        encoder = self._get_encoder(model)
         num_tokens = 0
         
         # Add tokens for message formatting (varies by model)
         num_tokens += 3  # Every reply is primed with <|start|>assistant<|message|>
         
-        for message in full_messages:
-            num_tokens += 4  # Every message follows <|start|>{role}<|message|>{content}<|end|>
-            for key, value in message.items():
-                num_tokens += len(encoder.encode(value))
+        # The system prompt is counted as its own message
+        num_tokens += 4 + self.count_tokens(Role.SYSTEM, model) + self._count_system_prompt_tokens(_system_text(system_prompt), model)
+        
+        # Every message follows <|start|>{role}<|message|>{content}<|end|>
+        num_tokens += 4 * len(messages)
+        
+        # Encode every field of every message in one batch
+        num_tokens += sum(_token_lengths(model).count_many(
+            [value for message in messages for value in message.values()]
+        ))
         
         return num_tokens
     
@@ -80,17 +116,17 @@ class OpenAIProvider(LLMProvider):
         # Default context size for unknown models
         return 4096
     
-    def generate(self, 
-                messages: List[Dict[str, str]], 
-                system_prompt: str, 
-                tools: Optional[List[Dict[str, Any]]] = None, 
-                max_tokens: Optional[int] = None,
-                temperature: float = 0.7,
-                model: str = "gpt-4-turbo") -> Dict[str, Any]:
-        """Generate a response from the OpenAI API."""
+    def _prepare_params(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]],
+                        max_tokens: Optional[int],
+                        temperature: float,
+                        model: str) -> Dict[str, Any]:
+        """Check the context window and build the chat completion parameters."""
         # Prepare the complete messages list with system prompt
         full_messages = [
-            {"role": "system", "content": system_prompt}
+            {"role": Role.SYSTEM, "content": _system_text(system_prompt)}
         ] + messages
         
         # Check if messages fit in context window
@@ -111,39 +147,197 @@ class OpenAIProvider(LLMProvider):
         if tools:
             params["tools"] = tools
         
+        return params
+    
+    @staticmethod
+    def _parse_arguments(arguments: str) -> Dict[str, Any]:
+        """Parse a tool call's JSON arguments, keeping the raw string if they are malformed."""
+        try:
+            return orjson.loads(arguments)
+        except orjson.JSONDecodeError:
+            return {"raw_arguments": arguments}
+    
+    def generate(self, 
+                messages: List[Dict[str, str]], 
+                system_prompt: Union[str, List[str]], 
+                tools: Optional[List[Dict[str, Any]]] = None, 
+                max_tokens: Optional[int] = None,
+                temperature: float = 0.7,
+                model: str = "gpt-4-turbo") -> Dict[str, Any]:
+        """Generate a response from the OpenAI API, or from the response cache if one is configured."""
+        request = {
+            "messages": messages,
+            "system_prompt": system_prompt,
+            "tools": tools,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model
+        }
+        cached = self._cached_result(request)
+        if cached is not None:
+            return cached
+        
+        params = self._prepare_params(**request)
+        
         # Make the API call
         try:
             response = self.client.chat.completions.create(**params)
+            return self._build_result(request, response)
             
-            # Process the response
-            result = {
-                "content": response.choices[0].message.content,
-                "model": response.model,
-                "finish_reason": response.choices[0].finish_reason,
+        except Exception as e:
+            error_msg = str(e)
+            raise RuntimeError(f"Error calling OpenAI API: {error_msg}")
+    
+    async def agenerate(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]] = None,
+                        max_tokens: Optional[int] = None,
+                        temperature: float = 0.7,
+                        model: str = "gpt-4-turbo") -> Dict[str, Any]:
+        """Generate a response like generate(), without blocking the event loop while waiting on the API."""
+        request = {
+            "messages": messages,
+            "system_prompt": system_prompt,
+            "tools": tools,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model
+        }
+        cached = self._cached_result(request)
+        if cached is not None:
+            return cached
+        
+        params = self._prepare_params(**request)
+        
+        try:
+            response = await self.async_client.chat.completions.create(**params)
+            return self._build_result(request, response)
+            
+        except Exception as e:
+            error_msg = str(e)
+            raise RuntimeError(f"Error calling OpenAI API: {error_msg}")
+    
+    def _cached_result(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look a request up in the response cache, if one is configured."""
+        if self.cache is None:
+            return None
+        
+        cached = self.cache.get(request)
+        if cached is None:
+            return None
+        
+        # Answered without an API call, so no tokens were spent
+        return {**cached, "usage": {"input_tokens": 0, "output_tokens": 0}, "cached": True}
+    
+    def _build_result(self, request: Dict[str, Any], response: Any) -> Dict[str, Any]:
+        """Convert an API response to a result dict, caching it if a response cache is configured."""
+        # Process the response
+        result = {
+            "content": response.choices[0].message.content,
+            "model": response.model,
+            "finish_reason": response.choices[0].finish_reason,
+            "usage": {
+                "input_tokens": response.usage.prompt_tokens,
+                "output_tokens": response.usage.completion_tokens
             }
+        }
+        
+        # Handle tool calls if present
+        if hasattr(response.choices[0].message, "tool_calls") and response.choices[0].message.tool_calls:
+            tool_calls = []
+            for tool_call in response.choices[0].message.tool_calls:
+                tool_calls.append({
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": self._parse_arguments(tool_call.function.arguments)
+                    }
+                })
             
-            # Handle tool calls if present
-            if hasattr(response.choices[0].message, "tool_calls") and response.choices[0].message.tool_calls:
-                tool_calls = []
-                for tool_call in response.choices[0].message.tool_calls:
-                    try:
-                        args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError:
-                        args = {"raw_arguments": tool_call.function.arguments}
-                        
-                    tool_calls.append({
-                        "id": tool_call.id,
-                        "type": "function",
-                        "function": {
-                            "name": tool_call.function.name,
-                            "arguments": args
-                        }
-                    })
+            result["tool_calls"] = tool_calls
+        
+        if self.cache is not None:
+            self.cache.put(request, result)
+        
+        return result
+    
+    def generate_stream(self,
+                        messages: List[Dict[str, str]],
+                        system_prompt: Union[str, List[str]],
+                        tools: Optional[List[Dict[str, Any]]] = None,
+                        max_tokens: Optional[int] = None,
+                        temperature: float = 0.7,
+                        model: str = "gpt-4-turbo") -> Iterator[Dict[str, Any]]:
+        """Stream a response from the OpenAI API.
+        
+        Yields:
+            {"type": "text", "content": ...} for each piece of text as it arrives, then one
+            {"type": "done", ...} event carrying the same fields as generate()'s result
+        """
+        params = self._prepare_params(messages, system_prompt, tools, max_tokens, temperature, model)
+        params["stream"] = True
+        # Without this OpenAI never reports usage for a stream; with it, the last chunk carries it
+        # and has no choices
+        params["stream_options"] = {"include_usage": True}
+        
+        try:
+            content = []
+            tool_calls = []
+            pending = None  # Tool call whose argument JSON is still arriving
+            result = {"model": model, "finish_reason": None}
+            
+            for chunk in self.client.chat.completions.create(**params):
+                result["model"] = chunk.model
+                if getattr(chunk, "usage", None):
+                    result["usage"] = {
+                        "input_tokens": chunk.usage.prompt_tokens,
+                        "output_tokens": chunk.usage.completion_tokens
+                    }
+                if not chunk.choices:
+                    continue
+                
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    result["finish_reason"] = choice.finish_reason
                 
+                delta = choice.delta
+                if delta.content:
+                    content.append(delta.content)
+                    yield {"type": "text", "content": delta.content}
+                
+                for tool_delta in delta.tool_calls or []:
+                    if pending is None or tool_delta.index != pending["index"]:
+                        # A new tool call has started, so the previous one's arguments are complete
+                        if pending is not None:
+                            tool_calls.append(self._finish_tool_call(pending))
+                        pending = {"index": tool_delta.index, "id": tool_delta.id, "name": "", "arguments": []}
+                    if tool_delta.function.name:
+                        pending["name"] += tool_delta.function.name
+                    if tool_delta.function.arguments:
+                        pending["arguments"].append(tool_delta.function.arguments)
+            
+            if pending is not None:
+                tool_calls.append(self._finish_tool_call(pending))
+            
+            result["content"] = "".join(content)
+            if tool_calls:
                 result["tool_calls"] = tool_calls
             
-            return result
+            yield {"type": "done", **result}
             
         except Exception as e:
             error_msg = str(e)
             raise RuntimeError(f"Error calling OpenAI API: {error_msg}")
+    
+    def _finish_tool_call(self, pending: Dict[str, Any]) -> Dict[str, Any]:
+        """Assemble a streamed tool call once all of its argument fragments have arrived."""
+        return {
+            "id": pending["id"],
+            "type": "function",
+            "function": {
+                "name": pending["name"],
+                "arguments": self._parse_arguments("".join(pending["arguments"]))
+            }
+        }
@@ -0,0 +1,127 @@
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+import hashlib
+import time
+import numpy as np
+import orjson
+
+from ..memory.vector_index import VectorIndex
+
+
+class ResponseCache:
+    """Caches LLM responses so repeated prompts skip the network round trip.
+
+    Requests are matched exactly on everything that shapes the response. With an
+    embedder, a request whose earlier turns match exactly and whose last turn is
+    semantically close to a cached one is also answered from the cache.
+    """
+
+    def __init__(self,
+                 maxsize: int = 1024,
+                 ttl: float = 600,
+                 client: Optional[Any] = None,
+                 embedder: Optional[Callable[[List[str]], Any]] = None,
+                 similarity_threshold: float = 0.97,
+                 vector_index: Optional[VectorIndex] = None):
+        """Initialize the cache.
+
+        Args:
+            maxsize: Number of responses kept in process
+            ttl: Seconds a cached response stays valid
+            client: Optional Redis client used as a shared second tier for exact matches
+            embedder: Optional function mapping a list of texts to embedding vectors, enabling semantic matches
+            similarity_threshold: Minimum cosine similarity for a semantic match
+            vector_index: Index for last-turn embeddings (exact numpy search if not provided)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.client = client
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.vector_index = vector_index if vector_index is not None else VectorIndex()
+        # Key -> (expiry time, scope of the earlier turns, response)
+        self._entries: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _digest(payload: Any) -> str:
+        return hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+    def _keys(self, request: Dict[str, Any]) -> Tuple[str, str]:
+        """Get the exact-match key of a request and the scope shared by requests differing only in the last turn."""
+        messages = request["messages"]
+        scope = self._digest({**request, "messages": messages[:-1]})
+        key = self._digest([scope, messages[-1] if messages else None])
+        return key, scope
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Embed a text as an L2-normalized float32 vector."""
+        vector = np.asarray(self.embedder([text]), dtype=np.float32)[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look up the cached response to a request.
+
+        Args:
+            request: The generate() arguments (messages, system_prompt, tools, max_tokens, temperature, model)
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        key, scope = self._keys(request)
+        response = self._get_exact(key)
+        if response is None and self.embedder is not None and request["messages"]:
+            response = self._get_similar(scope, request["messages"][-1]["content"])
+        return response
+
+    def _get_exact(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[2]
+            self._remove(key)
+
+        if self.client is not None:
+            cached = self.client.get(f"llm:{key}")
+            if cached is not None:
+                return orjson.loads(cached)
+
+        return None
+
+    def _get_similar(self, scope: str, content: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        for key, score in self.vector_index.search(self._embed(content), 5):
+            if score < self.similarity_threshold:
+                break
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == scope and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[2]
+        return None
+
+    def put(self, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Cache the response to a request."""
+        key, scope = self._keys(request)
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, scope, response)
+        if self.embedder is not None and request["messages"]:
+            self.vector_index.add([key], self._embed(request["messages"][-1]["content"]).reshape(1, -1))
+
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+        if self.client is not None:
+            self.client.setex(f"llm:{key}", int(self.ttl), orjson.dumps(response))
+
+    def _remove(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.vector_index.remove(key)
+
+    def clear(self) -> None:
+        """Remove all responses cached in process."""
+        self._entries.clear()
+        self.vector_index.clear()
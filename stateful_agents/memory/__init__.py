@@ -2,3 +2,6 @@ from .memory_manager import MemoryManager
 from .core_memory import CoreMemory
 from .archival_memory import ArchivalMemory
 from .recall_memory import RecallMemory
+from .vector_index import VectorIndex, FaissVectorIndex
+from .redis_store import RedisMemoryStore
+from .semantic_cache import SemanticCache
@@ -1,30 +1,107 @@
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+import hashlib
 import time
-from pydantic import BaseModel, Field
+import uuid
+import msgspec
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
+from .vector_index import VectorIndex
 
-class ArchivalMemoryItem(BaseModel):
+# Items keep nanosecond timestamps, but search results report seconds like the database and API do
+_NS_PER_SECOND = 1_000_000_000
+
+
+class ArchivalMemoryItem(msgspec.Struct):
     """A single item in archival memory."""
     
     id: str
     content: str
-    metadata: Dict[str, Any] = Field(default_factory=dict)
-    timestamp: float = Field(default_factory=time.time)
+    metadata: Dict[str, Any] = msgspec.field(default_factory=dict)
+    timestamp: int = msgspec.field(default_factory=time.time_ns)  # Nanoseconds since the epoch
 
 
 class ArchivalMemory(BaseModel):
     """Archival memory stores information outside the context window."""
     
-    items: List[ArchivalMemoryItem] = Field(default_factory=list)
+    items: Dict[str, ArchivalMemoryItem] = Field(default_factory=dict, description="Memory items keyed by ID, in insertion order")
     vector_store_initialized: bool = Field(False)
+    embedder: Optional[Callable[[List[str]], Any]] = Field(None, exclude=True, description="Maps a batch of texts to embedding vectors")
+    vector_index: Optional[VectorIndex] = Field(None, exclude=True, description="Index over L2-normalized item embeddings; an exact in-memory index is created if none is given")
+    result_cache: Optional[Any] = Field(None, exclude=True, description="Redis client used to cache search results")
+    result_cache_ttl: int = Field(300, description="Seconds a cached search result stays valid")
+    
+    _total_size: int = PrivateAttr(0)
+    # Lowercased content per item, and all of it joined into one NUL-separated string
+    # (with each item's start offset) so keyword search is a single C-level scan
+    _lowered: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _corpus: Optional[Tuple[str, List[int], List[str]]] = PrivateAttr(None)
+    # Memoized query embeddings, tied to the embedder that produced them
+    _query_cache: Optional[Tuple[Callable, Callable[[str], np.ndarray]]] = PrivateAttr(None)
+    # Cached search results are keyed by generation, which every change bumps, so stale
+    # entries are never read again and simply expire
+    _cache_namespace: str = PrivateAttr(default_factory=lambda: uuid.uuid4().hex)
+    _generation: int = PrivateAttr(0)
+    
+    model_config = ConfigDict(defer_build=True, arbitrary_types_allowed=True)
+    
+    def __init__(self, **data):
+        """Initialize archival memory, seeding the running size from any initial items."""
+        super().__init__(**data)
+        self._total_size = sum(len(item.content) for item in self.items.values())
+        self._lowered = {item_id: item.content.lower() for item_id, item in self.items.items()}
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle without the embedder, which is usually shared between agents, or the cache client."""
+        state = super().__getstate__()
+        state["__dict__"] = {**state["__dict__"], "embedder": None, "result_cache": None}
+        state["__pydantic_private__"] = {**(state["__pydantic_private__"] or {}), "_query_cache": None}
+        return state
+    
+    @staticmethod
+    def _new_id() -> str:
+        """Generate a unique item ID, safe for many adds within the same second."""
+        return f"mem_{uuid.uuid4().hex}"
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts as L2-normalized float32 rows."""
+        vectors = np.asarray(self.embedder(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
     
-    class Config:
-        arbitrary_types_allowed = True
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, reusing the normalized vector for recently seen queries."""
+        if self._query_cache is None or self._query_cache[0] is not self.embedder:
+            self._query_cache = (self.embedder, lru_cache(maxsize=512)(self._embed_query_uncached))
+        
+        return self._query_cache[1](query)
+    
+    def _embed_query_uncached(self, query: str) -> np.ndarray:
+        """Embed a single query as a read-only normalized vector, safe to share between searches."""
+        vector = self._embed([query])[0]
+        vector.setflags(write=False)
+        return vector
+    
+    def _index_vectors(self, item_ids: List[str], vectors: np.ndarray) -> None:
+        """Add embedding rows to the vector index, creating it on first use."""
+        if self.vector_index is None:
+            self.vector_index = VectorIndex()
+        
+        self.vector_index.add(item_ids, vectors)
+        self.vector_store_initialized = True
+    
+    def _invalidate(self) -> None:
+        """Drop derived search state after the set of items changes."""
+        self._corpus = None
+        self._generation += 1
     
     def add(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Add content to archival memory."""
-        # Generate a simple ID for now
-        item_id = f"mem_{int(time.time())}_{len(self.items)}"
+        item_id = self._new_id()
         
         # Create memory item
         item = ArchivalMemoryItem(
@@ -34,47 +111,132 @@ class ArchivalMemory(BaseModel):
         )
         
         # Store the item
-        self.items.append(item)
+        self.items[item_id] = item
+        self._total_size += len(content)
+        self._lowered[item_id] = content.lower()
+        self._invalidate()
         
-        # TODO: Add to vector store once implemented
+        if self.embedder is not None:
+            self._index_vectors([item_id], self._embed([content]))
         
         return item_id
     
+    def add_many(self, contents: List[str], metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Add several pieces of content to archival memory, embedding them in one batch."""
+        items = []
+        for content in contents:
+            item = ArchivalMemoryItem(
+                id=self._new_id(),
+                content=content,
+                metadata=dict(metadata) if metadata else {}
+            )
+            self.items[item.id] = item
+            items.append(item)
+            self._total_size += len(content)
+            self._lowered[item.id] = content.lower()
+        self._invalidate()
+        
+        item_ids = [item.id for item in items]
+        if self.embedder is not None and contents:
+            self._index_vectors(item_ids, self._embed(contents))
+        
+        return item_ids
+    
     def get(self, item_id: str) -> Optional[ArchivalMemoryItem]:
         """Get a memory item by ID."""
-        for item in self.items:
-            if item.id == item_id:
-                return item
-        return None
+        return self.items.get(item_id)
     
     def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search archival memory."""
-        # TODO: Implement vector search
-        # For now, return simple keyword matching
+        """Search archival memory, consulting the result cache first if one is configured."""
+        if self.result_cache is None:
+            return self._search(query, limit)
+        
+        key = f"memory:{self._cache_namespace}:{self._generation}:{hashlib.sha1(query.encode()).hexdigest()}:{limit}"
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return msgspec.json.decode(cached)
+        
+        results = self._search(query, limit)
+        self.result_cache.setex(key, self.result_cache_ttl, msgspec.json.encode(results))
+        return results
+    
+    def _search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Search archival memory without the result cache."""
+        if self.embedder is not None and self.vector_index is not None and len(self.vector_index):
+            return self._vector_search(query, limit)
+        
+        # Without an embedder, fall back to simple keyword matching
         results = []
-        query = query.lower()
-        
-        for item in self.items:
-            if query in item.content.lower():
-                results.append({
-                    "id": item.id,
-                    "content": item.content,
-                    "metadata": item.metadata,
-                    "timestamp": item.timestamp
-                })
-                if len(results) >= limit:
-                    break
+        for item_id in self._keyword_matches(query.lower(), limit):
+            item = self.items[item_id]
+            results.append({
+                "id": item.id,
+                "content": item.content,
+                "metadata": item.metadata,
+                "timestamp": item.timestamp / _NS_PER_SECOND
+            })
+        
+        return results
+    
+    def _keyword_matches(self, query: str, limit: int) -> List[str]:
+        """Find the IDs of the first items, in insertion order, whose content contains a lowercase query."""
+        if limit <= 0 or not self._lowered:
+            return []
+        
+        if "\x00" in query:
+            # The separator would match across item boundaries, so check items one by one
+            return [item_id for item_id, lowered in self._lowered.items() if query in lowered][:limit]
+        
+        if self._corpus is None:
+            ids = list(self._lowered)
+            # Item i starts after the first i items and their separators, computed without a Python-level loop
+            starts = list(accumulate(map((1).__add__, map(len, self._lowered.values())), initial=0))
+            starts.pop()
+            self._corpus = ("\x00".join(self._lowered.values()), starts, ids)
+        
+        corpus, starts, ids = self._corpus
+        matches = []
+        pos = corpus.find(query)
+        while pos != -1 and len(matches) < limit:
+            index = bisect_right(starts, pos) - 1
+            if index < 0:
+                break
+            matches.append(ids[index])
+            
+            # Resume at the next item so each item is reported once
+            if index + 1 >= len(starts):
+                break
+            pos = corpus.find(query, starts[index + 1])
+        
+        return matches
+    
+    def _vector_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Rank items by cosine similarity to the query embedding."""
+        results = []
+        for item_id, score in self.vector_index.search(self._embed_query(query), limit):
+            item = self.items[item_id]
+            results.append({
+                "id": item.id,
+                "content": item.content,
+                "metadata": item.metadata,
+                "timestamp": item.timestamp / _NS_PER_SECOND,
+                "score": score
+            })
         
         return results
     
     def delete(self, item_id: str) -> bool:
         """Delete a memory item."""
-        for i, item in enumerate(self.items):
-            if item.id == item_id:
-                self.items.pop(i)
-                # TODO: Remove from vector store once implemented
-                return True
-        return False
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return False
+        
+        self._total_size -= len(item.content)
+        del self._lowered[item_id]
+        self._invalidate()
+        if self.vector_index is not None:
+            self.vector_index.remove(item_id)
+        return True
     
     def count(self) -> int:
         """Get the number of memory items."""
@@ -82,9 +244,13 @@ class ArchivalMemory(BaseModel):
     
     def total_size(self) -> int:
         """Get the total size of all memory items in characters."""
-        return sum(len(item.content) for item in self.items)
+        return self._total_size
     
     def clear(self) -> None:
         """Clear all memory items."""
         self.items.clear()
-        # TODO: Clear vector store once implemented
+        self._total_size = 0
+        self._lowered.clear()
+        self._invalidate()
+        if self.vector_index is not None:
+            self.vector_index.clear()
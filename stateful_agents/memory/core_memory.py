@@ -1,12 +1,20 @@
-from typing import Dict, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Dict, Iterable, Mapping, Optional, Any
+from types import MappingProxyType
+import msgspec
 
 
-class CoreMemory(BaseModel):
+class CoreMemory(msgspec.Struct, dict=True):
     """Core memory keeps critical information within the context window."""
     
-    blocks: Dict[str, str] = Field(default_factory=dict)
-    max_block_size: int = Field(1024, description="Maximum size of a single memory block in characters")
+    blocks: Dict[str, str] = msgspec.field(default_factory=dict)
+    max_block_size: int = 1024  # Maximum size of a single memory block in characters
+    versions: Dict[str, int] = msgspec.field(default_factory=dict)  # Number of times each block has been written
+    version: int = 0  # Bumped whenever any block changes
+    
+    def __post_init__(self):
+        """Seed the running size from any initial blocks."""
+        # Kept as a plain attribute rather than a field so it is never serialized
+        self._total_size = sum(len(value) for value in self.blocks.values())
     
     def add_or_update(self, key: str, value: str) -> None:
         """Add or update a memory block."""
@@ -14,12 +22,34 @@ class CoreMemory(BaseModel):
             # Truncate if exceeds maximum size
             value = value[:self.max_block_size]
         
+        self._total_size += len(value) - len(self.blocks.get(key, ""))
         self.blocks[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.version += 1
+    
+    def add_many(self, blocks: Mapping[str, str]) -> None:
+        """Add or update several memory blocks as one change."""
+        for key, value in blocks.items():
+            value = value[:self.max_block_size]
+            self._total_size += len(value) - len(self.blocks.get(key, ""))
+            self.blocks[key] = value
+            self.versions[key] = self.versions.get(key, 0) + 1
+        if blocks:
+            self.version += 1
     
     def get(self, key: str) -> Optional[str]:
         """Get a memory block by key."""
         return self.blocks.get(key)
     
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Get several memory blocks by key, with None for missing keys."""
+        blocks = self.blocks
+        return {key: blocks.get(key) for key in keys}
+    
+    def get_version(self, key: str) -> int:
+        """Get the version of a memory block, bumped on every write."""
+        return self.versions.get(key, 0)
+    
     def has(self, key: str) -> bool:
         """Check if a memory block exists."""
         return key in self.blocks
@@ -27,20 +57,27 @@ class CoreMemory(BaseModel):
     def delete(self, key: str) -> None:
         """Delete a memory block."""
         if key in self.blocks:
-            del self.blocks[key]
+            self._total_size -= len(self.blocks.pop(key))
+            self.version += 1
     
     def get_all(self) -> Dict[str, str]:
         """Get all memory blocks."""
         return self.blocks.copy()
     
+    def view(self) -> Mapping[str, str]:
+        """Get a read-only live view of all memory blocks without copying them."""
+        return MappingProxyType(self.blocks)
+    
     def count(self) -> int:
         """Get the number of memory blocks."""
         return len(self.blocks)
     
     def total_size(self) -> int:
         """Get the total size of all memory blocks in characters."""
-        return sum(len(value) for value in self.blocks.values())
+        return self._total_size
     
     def clear(self) -> None:
         """Clear all memory blocks."""
         self.blocks.clear()
+        self._total_size = 0
+        self.version += 1
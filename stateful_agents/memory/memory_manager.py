@@ -1,9 +1,10 @@
-from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel, Field
+from typing import Callable, Dict, List, Literal, Mapping, Optional, Any, Union
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from .core_memory import CoreMemory
 from .archival_memory import ArchivalMemory
 from .recall_memory import RecallMemory
+from ..tokens import TokenEstimator
 
 
 class MemoryManager(BaseModel):
@@ -13,8 +14,32 @@ class MemoryManager(BaseModel):
     archival_memory: ArchivalMemory = Field(default_factory=ArchivalMemory)
     recall_memory: RecallMemory = Field(default_factory=RecallMemory)
     
-    class Config:
-        arbitrary_types_allowed = True
+    # Read-only models that are typically shared by every agent in a process
+    embedder: Optional[Callable[[List[str]], Any]] = Field(None, exclude=True, description="Embedding model for archival memory")
+    tokenizer: Optional[Any] = Field(None, exclude=True, description="Token encoder used to measure memory usage")
+    recall_policy: Optional[Literal["lru", "2q"]] = Field(None, description="Eviction policy for recall memory, overriding the recall memory's own setting")
+    
+    _token_estimator: Optional[TokenEstimator] = PrivateAttr(None)
+    
+    model_config = ConfigDict(defer_build=True, arbitrary_types_allowed=True)
+    
+    def __init__(self, **data):
+        """Initialize the memory manager with the given parameters."""
+        super().__init__(**data)
+        
+        # Hand the shared embedder to archival memory unless it brought its own
+        if self.embedder is not None and self.archival_memory.embedder is None:
+            self.archival_memory.embedder = self.embedder
+        
+        if self.recall_policy is not None:
+            self.recall_memory.policy = self.recall_policy
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle without the shared embedder and tokenizer."""
+        state = super().__getstate__()
+        state["__dict__"] = {**state["__dict__"], "embedder": None, "tokenizer": None}
+        state["__pydantic_private__"] = {**(state["__pydantic_private__"] or {}), "_token_estimator": None}
+        return state
     
     def add_core_memory(self, key: str, value: str) -> None:
         """Add or update a core memory block."""
@@ -32,10 +57,18 @@ class MemoryManager(BaseModel):
         """Get all core memory blocks."""
         return self.core_memory.get_all()
     
+    def get_core_memory_view(self) -> Mapping[str, str]:
+        """Get a read-only live view of all core memory blocks."""
+        return self.core_memory.view()
+    
     def add_to_archival(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Add content to archival memory."""
         return self.archival_memory.add(content, metadata)
     
+    def add_to_archival_bulk(self, contents: List[str], metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Add several pieces of content to archival memory in one batch."""
+        return self.archival_memory.add_many(contents, metadata)
+    
     def search_archival(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Search archival memory."""
         return self.archival_memory.search(query, limit)
@@ -44,14 +77,26 @@ class MemoryManager(BaseModel):
         """Add a message to recall memory."""
         self.recall_memory.add(message)
     
-    def get_relevant_recall(self, query: str, limit: int = 5) -> List[Any]:
-        """Get relevant messages from recall memory."""
-        return self.recall_memory.search(query, limit)
+    def get_relevant_recall(self, query: str, limit: int = 5, promote: bool = True) -> List[Any]:
+        """Get relevant messages from recall memory, marking them referenced unless promote is False."""
+        return self.recall_memory.search(query, limit, promote=promote)
     
     def get_recent_recall(self, limit: int = 10) -> List[Any]:
         """Get the most recent messages from recall memory."""
         return self.recall_memory.get_recent(limit)
     
+    @property
+    def token_estimator(self) -> TokenEstimator:
+        """Get the token estimator built around this manager's tokenizer."""
+        if self._token_estimator is None:
+            self._token_estimator = TokenEstimator(encoding=self.tokenizer)
+        
+        return self._token_estimator
+    
+    def count_tokens(self) -> Dict[str, int]:
+        """Count the tokens held in core and recall memory."""
+        return self.token_estimator.count_memory(self)
+    
     def get_memory_stats(self) -> Dict[str, Any]:
         """Get statistics about the agent's memory."""
         return {
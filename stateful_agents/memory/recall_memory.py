@@ -1,33 +1,220 @@
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, Iterable, Iterator, List, Literal, Optional, Set, Any, Tuple
+from collections import defaultdict, deque
+from itertools import islice
 import time
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, SkipValidation
 
 
 class RecallMemory(BaseModel):
     """Recall memory stores conversation history."""
     
-    messages: List[Any] = Field(default_factory=list)
+    # Not validated: pydantic would copy every message into a new deque that __init__ replaces anyway
+    messages: SkipValidation[Deque[Any]] = Field(default_factory=deque)
     max_messages: int = Field(1000, description="Maximum number of messages to store")
+    policy: Literal["lru", "2q"] = Field("lru", description="Eviction policy: 'lru' evicts the oldest messages, '2q' evicts never-referenced messages first")
+    search_cache: Optional[Any] = Field(None, exclude=True, description="SemanticCache answering repeated and near-duplicate searches")
+    
+    _total_size: int = PrivateAttr(0)
+    # Sequence numbers of messages referenced since they were added (the 2Q hot queue);
+    # everything else in messages is cold. Messages themselves stay in conversation order.
+    # Sequence numbers rather than object ids, so the same object stored twice counts twice
+    _hot: Set[int] = PrivateAttr(default_factory=set)
+    # Sequence number of each message, in the same order as messages, and each number's message
+    # with its lowercased content and its size as counted when it was added, so search never
+    # re-lowers and removing a message subtracts exactly what adding it counted
+    _seqs: Deque[int] = PrivateAttr(default_factory=deque)
+    _entries: Dict[int, Tuple[Any, str, int]] = PrivateAttr(default_factory=dict)
+    _next_seq: int = PrivateAttr(0)
+    # Sequence numbers of each stored message object, oldest first, keyed by its id(), so touch
+    # finds the most recent occurrence without scanning; _entries keeps the objects alive
+    _occurrences: Dict[int, List[int]] = PrivateAttr(default_factory=dict)
+    # Trigram index: every three-character substring of the lowercased contents -> sequence
+    # numbers of the messages containing it. A substring query can only match messages holding
+    # all of its trigrams, so search checks those rather than every message
+    _trigrams: Dict[str, Set[int]] = PrivateAttr(default_factory=lambda: defaultdict(set))
+    
+    model_config = ConfigDict(defer_build=True)
+    
+    def __init__(self, **data):
+        """Initialize recall memory, seeding the running size from any initial messages."""
+        super().__init__(**data)
+        # The bound guarantees the queue never outgrows max_messages, even if a caller appends directly
+        self.messages = deque(self.messages, maxlen=self.max_messages)
+        self._seqs = deque((self._index(msg) for msg in self.messages), maxlen=self.max_messages)
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle without the search cache, whose embedder is usually shared."""
+        state = super().__getstate__()
+        state["__dict__"] = {**state["__dict__"], "search_cache": None}
+        return state
+    
+    @staticmethod
+    def _message_text(message: Any) -> str:
+        """Get the text content of a message."""
+        return message.content if hasattr(message, "content") else str(message)
+    
+    @staticmethod
+    def _trigrams_of(text: str) -> Set[str]:
+        """Get the distinct three-character substrings of a text."""
+        return set(map("".join, zip(text, text[1:], text[2:])))
+    
+    def _index(self, message: Any) -> int:
+        """Add a message to the search index and running size, and return its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        text = self._message_text(message)
+        lowered = text.lower()
+        self._entries[seq] = (message, lowered, len(text))
+        self._occurrences.setdefault(id(message), []).append(seq)
+        self._total_size += len(text)
+        for trigram in self._trigrams_of(lowered):
+            self._trigrams[trigram].add(seq)
+        return seq
+    
+    def _unindex(self, seqs: Iterable[int]) -> None:
+        """Remove messages from the search index and running size by sequence number."""
+        for seq in seqs:
+            message, lowered, size = self._entries.pop(seq)
+            self._total_size -= size
+            occurrences = self._occurrences[id(message)]
+            occurrences.remove(seq)
+            if not occurrences:
+                del self._occurrences[id(message)]
+            for trigram in self._trigrams_of(lowered):
+                postings = self._trigrams[trigram]
+                postings.discard(seq)
+                if not postings:
+                    del self._trigrams[trigram]
     
     def add(self, message: Any) -> None:
-        """Add a message to recall memory."""
+        """Add a message to recall memory, evicting one first if it is full."""
+        if self.max_messages <= 0:
+            # Nothing can be kept, so do not index a message the bounded deque would drop
+            return
+        
+        if len(self.messages) >= self.max_messages:
+            # Make room through the eviction policy rather than letting the bounded deque drop the oldest
+            self.evict(len(self.messages) - self.max_messages + 1)
+        
         self.messages.append(message)
+        self._seqs.append(self._index(message))
+        self._invalidate_search_cache()
+    
+    def touch(self, message: Any) -> None:
+        """Mark the most recent occurrence of a message as referenced, protecting it from eviction under the 2Q policy."""
+        if self.policy != "2q":
+            return
+        occurrences = self._occurrences.get(id(message))
+        if occurrences:
+            self._hot.add(occurrences[-1])
+    
+    def eviction_order(self, protect_recent: int = 0) -> Iterator[Any]:
+        """Iterate over messages in the order the eviction policy would remove them.
         
-        # Trim if exceeds maximum
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages:]
+        Args:
+            protect_recent: Number of most recent messages to leave out
+        """
+        if self.policy == "lru" or not self._hot:
+            return islice(self.messages, max(0, len(self.messages) - protect_recent))
+        
+        return (self._entries[seq][0] for seq in self._eviction_seqs(protect_recent))
+    
+    def _eviction_seqs(self, protect_recent: int) -> List[int]:
+        """Get the sequence numbers of the messages in 2Q eviction order: cold oldest first, then hot."""
+        cold, hot = [], []
+        for seq in islice(self._seqs, max(0, len(self._seqs) - protect_recent)):
+            (hot if seq in self._hot else cold).append(seq)
+        return cold + hot
+    
+    def evict(self, n: int, protect_recent: int = 0) -> List[Any]:
+        """Remove and return n messages chosen by the eviction policy, in conversation order.
+        
+        Args:
+            n: Number of messages to evict
+            protect_recent: Number of most recent messages that must not be evicted
+        """
+        if self.policy == "lru" or not self._hot:
+            n = min(n, max(0, len(self.messages) - protect_recent))
+            return self.evict_oldest(n)
+        
+        # Sequence numbers are unique, so exactly min(n, candidates) messages are evicted
+        victims = set(self._eviction_seqs(protect_recent)[:max(0, n)])
+        evicted, evicted_seqs, kept = [], [], []
+        for msg, seq in zip(self.messages, self._seqs):
+            if seq in victims:
+                evicted.append(msg)
+                evicted_seqs.append(seq)
+            else:
+                kept.append((msg, seq))
+        self.messages = deque((msg for msg, _ in kept), maxlen=self.max_messages)
+        self._seqs = deque((seq for _, seq in kept), maxlen=self.max_messages)
+        self._unindex(evicted_seqs)
+        self._forget(evicted_seqs)
+        return evicted
+    
+    def evict_oldest(self, n: int) -> List[Any]:
+        """Remove and return the n oldest messages."""
+        n = min(n, len(self.messages))
+        evicted = [self.messages.popleft() for _ in range(n)]
+        evicted_seqs = [self._seqs.popleft() for _ in range(n)]
+        self._unindex(evicted_seqs)
+        self._forget(evicted_seqs)
+        return evicted
     
-    def search(self, query: str, limit: int = 5) -> List[Any]:
-        """Search recall memory for relevant messages."""
+    def _forget(self, evicted_seqs: List[int]) -> None:
+        """Update bookkeeping for messages that have left recall memory, by sequence number."""
+        if self._hot:
+            self._hot.difference_update(evicted_seqs)
+        self._invalidate_search_cache()
+    
+    def _invalidate_search_cache(self) -> None:
+        """Drop this memory's cached search results after its messages changed."""
+        if self.search_cache is not None:
+            self.search_cache.clear(id(self))
+    
+    def search(self, query: str, limit: int = 5, promote: bool = True) -> List[Any]:
+        """Search recall memory for relevant messages, consulting the search cache first if one is configured.
+        
+        Args:
+            query: Text to look for
+            limit: Maximum number of messages to return
+            promote: Whether the results count as referenced under the 2Q policy; lookups the
+                agent makes on its own rather than on the model's request should pass False
+        """
+        if self.search_cache is None:
+            seqs = self._search(query, limit)
+        else:
+            # Sequence numbers are cached rather than messages; any change to the messages
+            # clears this memory's cached searches, so they never point at evicted ones
+            scope = (id(self), limit)
+            seqs = self.search_cache.get(scope, query)
+            if seqs is None:
+                seqs = self._search(query, limit)
+                self.search_cache.put(scope, query, seqs)
+        
+        if promote and self.policy == "2q":
+            self._hot.update(seqs)
+        return [self._entries[seq][0] for seq in seqs]
+    
+    def _search(self, query: str, limit: int) -> List[int]:
+        """Search recall memory without the search cache, returning the matches' sequence numbers."""
         # For now, implement a simple keyword search
         # This would be replaced with a more sophisticated semantic search later
         results = []
         query = query.lower()
         
-        for message in reversed(self.messages):  # Most recent first
-            content = message.content if hasattr(message, "content") else str(message)
-            if query in content.lower():
-                results.append(message)
+        trigrams = self._trigrams_of(query)
+        if trigrams:
+            # Intersect the posting sets, smallest first, to get the only messages that can match
+            postings = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+            candidates = sorted(postings[0].intersection(*postings[1:]), reverse=True)
+        else:
+            # Queries shorter than a trigram have to check every message
+            candidates = reversed(self._seqs)
+        
+        for seq in candidates:  # Most recent first
+            if query in self._entries[seq][1]:
+                results.append(seq)
                 if len(results) >= limit:
                     break
         
@@ -35,13 +222,16 @@ class RecallMemory(BaseModel):
     
     def get_recent(self, limit: int = 10) -> List[Any]:
         """Get the most recent messages."""
-        return self.messages[-limit:] if self.messages else []
+        if limit <= 0:
+            return []
+        return list(islice(self.messages, max(0, len(self.messages) - limit), None))
     
     def get_by_range(self, start: int, end: Optional[int] = None) -> List[Any]:
         """Get messages by range."""
-        if end is None:
-            return self.messages[start:]
-        return self.messages[start:end]
+        if start < 0 or (end is not None and end < 0):
+            # Negative indices need the length, so materialize once
+            return list(self.messages)[start:end]
+        return list(islice(self.messages, start, end))
     
     def count(self) -> int:
         """Get the number of messages."""
@@ -49,8 +239,15 @@ class RecallMemory(BaseModel):
     
     def total_size(self) -> int:
         """Get an approximate total size of all messages."""
-        return sum(len(msg.content) if hasattr(msg, "content") else len(str(msg)) for msg in self.messages)
+        return self._total_size
     
     def clear(self) -> None:
         """Clear all messages."""
         self.messages.clear()
+        self._seqs.clear()
+        self._entries.clear()
+        self._occurrences.clear()
+        self._trigrams.clear()
+        self._total_size = 0
+        self._hot.clear()
+        self._invalidate_search_cache()
@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Any, Union
+import msgspec
+
+from ..communication.message import Message
+
+_message_decoder = msgspec.json.Decoder(Message)
+
+
+def _text(value: Union[str, bytes]) -> str:
+    """Decode a value returned by a Redis client that may not decode responses itself."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisMemoryStore:
+    """Persists core and recall memory in Redis so agents can warm-start after a restart.
+
+    Core memory is stored as a hash at ``{prefix}:core:{agent_id}`` and recall
+    memory as a stream at ``{prefix}:recall:{agent_id}``, one entry per message.
+    """
+
+    def __init__(self, client: Any, key_prefix: str = "memory", max_messages: Optional[int] = None):
+        """Initialize the store.
+
+        Args:
+            client: redis.Redis client (or any client with the same interface)
+            key_prefix: Prefix for all keys written by the store
+            max_messages: Approximate cap on the length of each recall stream (unbounded if None)
+        """
+        self.client = client
+        self.key_prefix = key_prefix
+        self.max_messages = max_messages
+
+    def _core_key(self, agent_id: str) -> str:
+        return f"{self.key_prefix}:core:{agent_id}"
+
+    def _recall_key(self, agent_id: str) -> str:
+        return f"{self.key_prefix}:recall:{agent_id}"
+
+    def save_core(self, agent_id: str, blocks: Dict[str, str], pipe: Optional[Any] = None) -> None:
+        """Replace an agent's stored core memory blocks."""
+        target = self.client if pipe is None else pipe
+        key = self._core_key(agent_id)
+        target.delete(key)
+        if blocks:
+            target.hset(key, mapping=dict(blocks))
+
+    def load_core(self, agent_id: str) -> Dict[str, str]:
+        """Load an agent's stored core memory blocks."""
+        return {_text(key): _text(value) for key, value in self.client.hgetall(self._core_key(agent_id)).items()}
+
+    def save_messages(self, agent_id: str, messages: List[Message], pipe: Optional[Any] = None) -> None:
+        """Replace an agent's stored recall messages."""
+        target = self.client if pipe is None else pipe
+        key = self._recall_key(agent_id)
+        target.delete(key)
+        for message in messages:
+            target.xadd(key, {"data": msgspec.json.encode(message)}, maxlen=self.max_messages, approximate=True)
+
+    def load_messages(self, agent_id: str, count: Optional[int] = None) -> List[Message]:
+        """Load an agent's stored recall messages, oldest first.
+
+        Args:
+            agent_id: ID of the agent
+            count: Only load this many of the most recent messages (all if None)
+
+        Returns:
+            The stored messages
+        """
+        entries = self.client.xrevrange(self._recall_key(agent_id), count=count)
+        messages = []
+        for _, fields in reversed(entries):
+            data = fields.get(b"data", fields.get("data"))
+            messages.append(_message_decoder.decode(data))
+        return messages
+
+    def save(self, agent_id: str, memory_manager: Any) -> None:
+        """Save an agent's core and recall memory in a single MULTI/EXEC transaction."""
+        pipe = self.client.pipeline(transaction=True)
+        self.save_core(agent_id, memory_manager.core_memory.blocks, pipe)
+        self.save_messages(agent_id, list(memory_manager.recall_memory.messages), pipe)
+        pipe.execute()
+
+    def load(self, agent_id: str, memory_manager: Any) -> bool:
+        """Replace a memory manager's core and recall memory with an agent's stored state.
+
+        Returns:
+            True if any state was stored for the agent, False if the memory manager was left untouched
+        """
+        blocks = self.load_core(agent_id)
+        messages = self.load_messages(agent_id, count=memory_manager.recall_memory.max_messages)
+        if not blocks and not messages:
+            return False
+
+        core_memory = memory_manager.core_memory
+        core_memory.clear()
+        for key, value in blocks.items():
+            core_memory.add_or_update(key, value)
+
+        recall_memory = memory_manager.recall_memory
+        recall_memory.clear()
+        for message in messages:
+            recall_memory.add(message)
+
+        return True
@@ -0,0 +1,99 @@
+from typing import Callable, Dict, Hashable, List, Optional, Any, Tuple
+from collections import OrderedDict
+import time
+import numpy as np
+
+
+class SemanticCache:
+    """Caches search results so that repeated and near-duplicate queries skip the search.
+
+    Results are grouped by a scope key whose first element is the owning agent
+    (or memory) ID, for example ``(agent_id, "archival", limit)``. Within a scope, an
+    identical query is answered without embedding it, and a query whose embedding
+    is close enough to a cached query's reuses that query's results.
+    """
+
+    def __init__(self,
+                 embedder: Callable[[List[str]], Any],
+                 maxsize: int = 256,
+                 ttl: float = 300,
+                 similarity_threshold: float = 0.87):
+        """Initialize the cache.
+
+        Args:
+            embedder: Function mapping a list of texts to embedding vectors
+            maxsize: Number of queries cached per scope
+            ttl: Seconds cached results stay valid
+            similarity_threshold: Minimum cosine similarity for a query to reuse another's results
+        """
+        self.embedder = embedder
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # Scope -> query -> (expiry time, normalized query embedding, results)
+        self._scopes: Dict[Hashable, "OrderedDict[str, Tuple[float, np.ndarray, Any]]"] = {}
+        # The last query get() embedded and its embedding, so the put() after a miss reuses it
+        self._last_embedded: Optional[Tuple[str, np.ndarray]] = None
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Embed a query as an L2-normalized float32 vector."""
+        vector = np.asarray(self.embedder([query]), dtype=np.float32)[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, scope: Tuple[Hashable, ...], query: str) -> Optional[Any]:
+        """Look up cached results for a query.
+
+        Returns:
+            The cached results, or None on a miss
+        """
+        entries = self._scopes.get(scope)
+        if not entries:
+            return None
+
+        now = time.monotonic()
+        expired = [key for key, entry in entries.items() if entry[0] <= now]
+        for key in expired:
+            del entries[key]
+
+        entry = entries.get(query)
+        if entry is not None:
+            entries.move_to_end(query)
+            return entry[2]
+        if not entries:
+            return None
+
+        keys = list(entries)
+        embedding = self._embed(query)
+        self._last_embedded = (query, embedding)
+        scores = np.stack([entries[key][1] for key in keys]) @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        entries.move_to_end(keys[best])
+        return entries[keys[best]][2]
+
+    def put(self, scope: Tuple[Hashable, ...], query: str, results: Any) -> None:
+        """Cache the results of a query."""
+        last = self._last_embedded
+        embedding = last[1] if last is not None and last[0] == query else self._embed(query)
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        entries.pop(query, None)
+        entries[query] = (time.monotonic() + self.ttl, embedding, results)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def clear(self, owner: Optional[Hashable] = None) -> None:
+        """Drop cached results, either all of them or only those of scopes belonging to one owner.
+
+        Args:
+            owner: First element of the scopes to drop (all scopes if None)
+        """
+        if owner is None:
+            self._scopes.clear()
+            self._last_embedded = None
+            return
+
+        for scope in [scope for scope in self._scopes if scope[0] == owner]:
+            del self._scopes[scope]
@@ -0,0 +1,220 @@
+from typing import Dict, List, Optional, Set, Tuple, Any
+import numpy as np
+
+
+class VectorIndex:
+    """Exact cosine-similarity index over L2-normalized embedding vectors.
+
+    Vectors live in one contiguous float32 matrix, so scoring every item
+    is a single matrix-vector product.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    def add(self, item_ids: List[str], vectors: np.ndarray) -> None:
+        """Add normalized vectors for the given item IDs, growing the matrix geometrically."""
+        size = len(self._ids)
+        needed = size + len(item_ids)
+
+        if self._vectors is None:
+            self._vectors = np.empty((max(needed, 16), vectors.shape[1]), dtype=np.float32)
+        elif needed > self._vectors.shape[0]:
+            grown = np.empty((max(needed, 2 * self._vectors.shape[0]), self._vectors.shape[1]), dtype=np.float32)
+            grown[:size] = self._vectors[:size]
+            self._vectors = grown
+
+        self._vectors[size:needed] = vectors
+        for row, item_id in enumerate(item_ids, start=size):
+            self._rows[item_id] = row
+        self._ids.extend(item_ids)
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        """Get a copy of an item's vector, or None if the item is not in the index."""
+        row = self._rows.get(item_id)
+        return None if row is None else self._vectors[row].copy()
+
+    def remove(self, item_id: str) -> bool:
+        """Remove an item's vector by moving the last row into its slot."""
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+        return True
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Find the k items most similar to a normalized query vector, best first."""
+        size = len(self._ids)
+        k = min(k, size)
+        if k <= 0:
+            return []
+
+        scores = self._vectors[:size] @ query
+
+        # Partial sort for the top k, then order just those by score
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(self._ids[row], float(scores[row])) for row in top]
+
+    def clear(self) -> None:
+        """Remove all vectors."""
+        self._vectors = None
+        self._ids.clear()
+        self._rows.clear()
+
+
+class FaissVectorIndex(VectorIndex):
+    """Approximate nearest-neighbour index backed by a faiss HNSW graph.
+
+    Search cost grows logarithmically with the number of items instead of
+    linearly. HNSW graphs cannot drop entries, so removed items are
+    tombstoned and filtered out of results, and the graph is rebuilt from
+    the remaining items once tombstones make up too much of it.
+    """
+
+    def __init__(self, m: int = 32, ef_search: int = 64, max_removed_fraction: float = 0.25):
+        """Initialize an empty index.
+
+        Args:
+            m: Number of neighbours per node in the HNSW graph
+            ef_search: Size of the candidate list explored per query (higher is more accurate)
+            max_removed_fraction: Fraction of the graph that may be tombstones before it is rebuilt
+        """
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("FaissVectorIndex requires faiss (pip install faiss-cpu)") from e
+
+        self._faiss = faiss
+        self.m = m
+        self.ef_search = ef_search
+        self.max_removed_fraction = max_removed_fraction
+        self._index = None
+        self._labels: Dict[str, int] = {}
+        self._ids_by_label: Dict[int, str] = {}
+        self._removed: Set[int] = set()
+        self._next_label = 0
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._labels
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle the faiss index as bytes, since the native object cannot be pickled."""
+        state = self.__dict__.copy()
+        state.pop("_faiss")
+        if self._index is not None:
+            state["_index"] = self._faiss.serialize_index(self._index)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        import faiss
+
+        self.__dict__.update(state, _faiss=faiss)
+        if self._index is not None:
+            self._index = faiss.deserialize_index(self._index)
+
+    def _new_index(self, dim: int):
+        """Create an empty HNSW graph addressed by label."""
+        hnsw = self._faiss.IndexHNSWFlat(dim, self.m, self._faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efSearch = self.ef_search
+        return self._faiss.IndexIDMap(hnsw)
+
+    def add(self, item_ids: List[str], vectors: np.ndarray) -> None:
+        """Add normalized vectors for the given item IDs."""
+        if self._index is None:
+            self._index = self._new_index(vectors.shape[1])
+
+        labels = np.arange(self._next_label, self._next_label + len(item_ids), dtype=np.int64)
+        self._next_label += len(item_ids)
+        for item_id, label in zip(item_ids, labels.tolist()):
+            self._labels[item_id] = label
+            self._ids_by_label[label] = item_id
+
+        self._index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), labels)
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        """Get an item's vector, or None if the item is not in the index."""
+        label = self._labels.get(item_id)
+        if label is None:
+            return None
+
+        # The graph stores vectors by insertion position, which the ID map translates from labels
+        position = int(np.flatnonzero(self._faiss.vector_to_array(self._index.id_map) == label)[0])
+        return self._index.index.reconstruct(position)
+
+    def remove(self, item_id: str) -> bool:
+        """Tombstone an item so it no longer appears in results."""
+        label = self._labels.pop(item_id, None)
+        if label is None:
+            return False
+
+        del self._ids_by_label[label]
+        self._removed.add(label)
+        # Every search over-fetches by the number of tombstones, so do not let them pile up
+        if len(self._removed) > self.max_removed_fraction * self._index.ntotal:
+            self._compact()
+        return True
+
+    def _compact(self) -> None:
+        """Rebuild the graph from the items that have not been removed, dropping every tombstone."""
+        self._removed.clear()
+        if not self._labels:
+            self._index = None
+            return
+
+        labels = self._faiss.vector_to_array(self._index.id_map)
+        vectors = self._index.index.reconstruct_n(0, self._index.ntotal)
+        live = np.isin(labels, np.fromiter(self._ids_by_label, dtype=np.int64, count=len(self._ids_by_label)))
+
+        index = self._new_index(vectors.shape[1])
+        index.add_with_ids(np.ascontiguousarray(vectors[live]), labels[live].astype(np.int64))
+        self._index = index
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Find approximately the k items most similar to a normalized query vector, best first."""
+        k = min(k, len(self._labels))
+        if k <= 0:
+            return []
+
+        # Over-fetch so that tombstoned entries can be dropped without coming up short
+        scores, labels = self._index.search(
+            np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1),
+            k + len(self._removed)
+        )
+
+        results = []
+        for label, score in zip(labels[0].tolist(), scores[0].tolist()):
+            if label == -1 or label in self._removed:
+                continue
+            results.append((self._ids_by_label[label], score))
+            if len(results) == k:
+                break
+
+        return results
+
+    def clear(self) -> None:
+        """Remove all vectors."""
+        self._index = None
+        self._labels.clear()
+        self._ids_by_label.clear()
+        self._removed.clear()
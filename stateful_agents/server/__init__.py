@@ -1,2 +1,3 @@
 from .database import Database
-from .server import Server
\ No newline at end of file
+from .server import Server
+from .client import AgentClient, AsyncAgentClient
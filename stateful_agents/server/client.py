@@ -1,17 +1,41 @@
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
+import asyncio
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class AgentClient:
     """Client for interacting with the agent server."""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", max_retries: int = 3):
         """Initialize the client.
         
         Args:
             base_url: Base URL of the agent server
+            max_retries: Retries for failed connections and for idempotent requests answered with 502/503/504
         """
         self.base_url = base_url.rstrip("/")
+        
+        # Reuse keep-alive connections across calls instead of reconnecting per request.
+        # POSTs are only retried when the connection could not be made, so a message is never sent twice.
+        self.session = requests.Session()
+        retry = Retry(total=max_retries, backoff_factor=0.1, status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def __enter__(self) -> "AgentClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
     
     def create_agent(self, name: str, model: str, persona: str = "", 
                    system_prompt: str = "", context_window_limit: int = 4096) -> Dict[str, Any]:
@@ -27,7 +51,7 @@ class AgentClient:
         Returns:
             Dictionary with agent details
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/agents",
             json={
                 "name": name,
@@ -50,7 +74,7 @@ class AgentClient:
         Returns:
             Dictionary with agent details
         """
-        response = requests.get(f"{self.base_url}/agents/{agent_id}")
+        response = self.session.get(f"{self.base_url}/agents/{agent_id}")
         
         response.raise_for_status()
         return response.json()
@@ -68,7 +92,7 @@ class AgentClient:
         Returns:
             Dictionary with the response
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/agents/{agent_id}/messages",
             json={
                 "content": content,
@@ -80,6 +104,31 @@ class AgentClient:
         response.raise_for_status()
         return response.json()
     
+    def send_messages(self, agent_id: str, messages: List[str], sender_id: str = "user",
+                      metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send several consecutive messages to an agent in a single request.
+        
+        Args:
+            agent_id: The agent ID
+            messages: Message contents, in conversation order
+            sender_id: ID of the sender
+            metadata: Optional metadata applied to every message
+            
+        Returns:
+            Dictionary with one response per message
+        """
+        response = self.session.post(
+            f"{self.base_url}/agents/{agent_id}/messages/batch",
+            json={
+                "messages": messages,
+                "sender_id": sender_id,
+                "metadata": metadata or {}
+            }
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
     def get_core_memory(self, agent_id: str) -> Dict[str, str]:
         """Get all core memory for an agent.
         
@@ -89,7 +138,7 @@ class AgentClient:
         Returns:
             Dictionary mapping keys to values
         """
-        response = requests.get(f"{self.base_url}/agents/{agent_id}/memory/core")
+        response = self.session.get(f"{self.base_url}/agents/{agent_id}/memory/core")
         
         response.raise_for_status()
         return response.json()
@@ -105,7 +154,7 @@ class AgentClient:
         Returns:
             Dictionary with status
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/agents/{agent_id}/memory/core/{key}",
             data=value
         )
@@ -123,13 +172,14 @@ class AgentClient:
         Returns:
             List of messages
         """
-        response = requests.get(
+        with self.session.get(
             f"{self.base_url}/agents/{agent_id}/memory/recall",
-            params={"limit": limit}
-        )
-        
-        response.raise_for_status()
-        return response.json()
+            params={"limit": limit},
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            # The server streams one JSON message per line
+            return [orjson.loads(line) for line in response.iter_lines() if line]
     
     def add_to_archival(self, agent_id: str, content: str, 
                        metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -143,7 +193,7 @@ class AgentClient:
         Returns:
             Dictionary with memory ID
         """
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/agents/{agent_id}/memory/archival",
             params={"content": content},
             json=metadata or {}
@@ -163,7 +213,7 @@ class AgentClient:
         Returns:
             List of memory items
         """
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/agents/{agent_id}/memory/archival/search",
             params={
                 "query": query,
@@ -172,4 +222,258 @@ class AgentClient:
         )
         
         response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        return response.json()
+
+
+class AsyncAgentClient:
+    """Asynchronous client for interacting with the agent server.
+    
+    Independent calls, e.g. questions to different agents, can be awaited
+    together with asyncio.gather so their round-trips overlap.
+    """
+    
+    def __init__(self, base_url: str = "http://localhost:8000", timeout: Optional[float] = None,
+                 max_connections: int = 64, http2: bool = False):
+        """Initialize the client.
+        
+        Args:
+            base_url: Base URL of the agent server
+            timeout: Request timeout in seconds (LLM calls can be slow, so none by default)
+            max_connections: Maximum number of concurrent connections to the server
+            http2: Multiplex requests over HTTP/2 (requires the h2 package and an HTTP/2 server)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections),
+            http2=http2
+        )
+    
+    async def __aenter__(self) -> "AsyncAgentClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        await self.client.aclose()
+    
+    async def create_agent(self, name: str, model: str, persona: str = "", 
+                           system_prompt: str = "", context_window_limit: int = 4096) -> Dict[str, Any]:
+        """Create a new agent.
+        
+        Args:
+            name: Name of the agent
+            model: Model to use
+            persona: Agent persona
+            system_prompt: System prompt
+            context_window_limit: Context window limit in tokens
+            
+        Returns:
+            Dictionary with agent details
+        """
+        response = await self.client.post(
+            "/agents",
+            json={
+                "name": name,
+                "model": model,
+                "persona": persona,
+                "system_prompt": system_prompt,
+                "context_window_limit": context_window_limit
+            }
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def get_agent(self, agent_id: str) -> Dict[str, Any]:
+        """Get agent details.
+        
+        Args:
+            agent_id: The agent ID
+            
+        Returns:
+            Dictionary with agent details
+        """
+        response = await self.client.get(f"/agents/{agent_id}")
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def send_message(self, agent_id: str, content: str, sender_id: str = "user", 
+                           metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send a message to an agent.
+        
+        Args:
+            agent_id: The agent ID
+            content: Message content
+            sender_id: ID of the sender
+            metadata: Optional metadata
+            
+        Returns:
+            Dictionary with the response
+        """
+        response = await self.client.post(
+            f"/agents/{agent_id}/messages",
+            json={
+                "content": content,
+                "sender_id": sender_id,
+                "metadata": metadata or {}
+            }
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def send_messages(self, agent_id: str, messages: List[str], sender_id: str = "user",
+                            metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send several consecutive messages to an agent in a single request.
+        
+        Args:
+            agent_id: The agent ID
+            messages: Message contents, in conversation order
+            sender_id: ID of the sender
+            metadata: Optional metadata applied to every message
+            
+        Returns:
+            Dictionary with one response per message
+        """
+        response = await self.client.post(
+            f"/agents/{agent_id}/messages/batch",
+            json={
+                "messages": messages,
+                "sender_id": sender_id,
+                "metadata": metadata or {}
+            }
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def send_messages_bulk(self, items: List[Tuple[str, str]], sender_id: str = "user",
+                                 metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Send messages to any number of agents concurrently.
+        
+        Messages to the same agent are sent together in one batch request, in order,
+        while the requests to different agents run concurrently.
+        
+        Args:
+            items: (agent ID, message content) pairs
+            sender_id: ID of the sender
+            metadata: Optional metadata applied to every message
+            
+        Returns:
+            The agents' responses, in the same order as items
+        """
+        # Agent ID -> positions in items of the messages sent to it
+        positions: Dict[str, List[int]] = {}
+        for index, (agent_id, _) in enumerate(items):
+            positions.setdefault(agent_id, []).append(index)
+        
+        results = await asyncio.gather(*[
+            self.send_messages(agent_id, [items[index][1] for index in indexes], sender_id, metadata)
+            for agent_id, indexes in positions.items()
+        ])
+        
+        responses: List[str] = [""] * len(items)
+        for indexes, result in zip(positions.values(), results):
+            for index, response in zip(indexes, result["responses"]):
+                responses[index] = response
+        return responses
+    
+    async def get_core_memory(self, agent_id: str) -> Dict[str, str]:
+        """Get all core memory for an agent.
+        
+        Args:
+            agent_id: The agent ID
+            
+        Returns:
+            Dictionary mapping keys to values
+        """
+        response = await self.client.get(f"/agents/{agent_id}/memory/core")
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def update_core_memory(self, agent_id: str, key: str, value: str) -> Dict[str, Any]:
+        """Update a core memory block.
+        
+        Args:
+            agent_id: The agent ID
+            key: Memory block key
+            value: Memory block value
+            
+        Returns:
+            Dictionary with status
+        """
+        response = await self.client.post(
+            f"/agents/{agent_id}/memory/core/{key}",
+            content=value
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def get_recent_messages(self, agent_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get recent messages for an agent.
+        
+        Args:
+            agent_id: The agent ID
+            limit: Maximum number of messages
+            
+        Returns:
+            List of messages
+        """
+        async with self.client.stream(
+            "GET",
+            f"/agents/{agent_id}/memory/recall",
+            params={"limit": limit}
+        ) as response:
+            response.raise_for_status()
+            # The server streams one JSON message per line
+            return [orjson.loads(line) async for line in response.aiter_lines() if line]
+    
+    async def add_to_archival(self, agent_id: str, content: str, 
+                              metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Add content to archival memory.
+        
+        Args:
+            agent_id: The agent ID
+            content: Memory content
+            metadata: Optional metadata
+            
+        Returns:
+            Dictionary with memory ID
+        """
+        response = await self.client.post(
+            f"/agents/{agent_id}/memory/archival",
+            params={"content": content},
+            json=metadata or {}
+        )
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def search_archival(self, agent_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Search archival memory.
+        
+        Args:
+            agent_id: The agent ID
+            query: Search query
+            limit: Maximum number of results
+            
+        Returns:
+            List of memory items
+        """
+        response = await self.client.get(
+            f"/agents/{agent_id}/memory/archival/search",
+            params={
+                "query": query,
+                "limit": limit
+            }
+        )
+        
+        response.raise_for_status()
+        return response.json()
@@ -1,32 +1,197 @@
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, Iterator, List, Optional, Any, Tuple, Union
+from pathlib import Path
 import sqlite3
-import json
 import os
+import secrets
+import threading
 import time
+import msgspec
+
+from .write_queue import WriteQueue
+from ..memory.semantic_cache import SemanticCache
+
+
+# Metadata codecs are built once and shared by every row rather than set up per call
+_metadata_encoder = msgspec.json.Encoder()
+_metadata_decoder = msgspec.json.Decoder(Dict[str, Any])
+# Archival metadata is stored as a MessagePack BLOB, which is smaller and quicker to decode
+_pack_metadata = msgspec.msgpack.Encoder().encode
+_unpack_metadata = msgspec.msgpack.Decoder(Dict[str, Any]).decode
+
+
+def _decode_archival_metadata(value: Union[bytes, str, None]) -> Dict[str, Any]:
+    """Decode archival metadata, whether a MessagePack BLOB or JSON text written before the switch."""
+    if isinstance(value, bytes):
+        return _unpack_metadata(value)
+    return _metadata_decoder.decode(value) if value else {}
+
+# Full-text indexes over the content of each searchable table, kept in sync by triggers
+_FTS_TABLES = {"archival_fts": "archival_memory", "recall_fts": "recall_memory"}
+
+# Statements run per request are built once here. sqlite3 caches the compiled statement for
+# each SQL string per connection, so every call after the first on a thread skips parsing
+_SQL_UPSERT_AGENT = """
+INSERT INTO agents (
+    id, name, model, persona, system_prompt, context_window_limit, active, created_at, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    model = excluded.model,
+    persona = excluded.persona,
+    system_prompt = excluded.system_prompt,
+    context_window_limit = excluded.context_window_limit,
+    active = excluded.active,
+    updated_at = excluded.updated_at
+"""
+
+_SQL_GET_AGENT = "SELECT * FROM agents WHERE id = ?"
+
+_SQL_UPSERT_MEMORY_BLOCK = """
+INSERT INTO memory_blocks (
+    id, agent_id, key, value, created_at, updated_at
+) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (agent_id, key) DO UPDATE SET
+    value = excluded.value,
+    updated_at = excluded.updated_at
+"""
+
+_SQL_GET_MEMORY_BLOCKS = "SELECT key, value FROM memory_blocks WHERE agent_id = ?"
+
+_SQL_INSERT_ARCHIVAL = """
+INSERT INTO archival_memory (
+    id, agent_id, content, metadata, created_at
+) VALUES (?, ?, ?, ?, ?)
+"""
+
+# Most relevant first, using the full-text index rather than scanning every row
+_SQL_SEARCH_ARCHIVAL_FTS = """
+SELECT a.id, a.content, a.metadata, a.created_at
+FROM archival_fts f JOIN archival_memory a ON a.rowid = f.rowid
+WHERE archival_fts MATCH ? AND a.agent_id = ?
+ORDER BY bm25(archival_fts), a.rowid DESC
+LIMIT ?
+"""
+
+_SQL_SEARCH_ARCHIVAL_LIKE = """
+SELECT id, content, metadata, created_at 
+FROM archival_memory 
+WHERE agent_id = ? AND content LIKE ? 
+ORDER BY created_at DESC
+LIMIT ?
+"""
+
+_SQL_INSERT_MESSAGE = """
+INSERT INTO recall_memory (
+    id, agent_id, sender_id, receiver_id, content, message_type, metadata, created_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# The newest messages, returned oldest first
+_SQL_RECENT_MESSAGES = """
+SELECT id, sender_id, receiver_id, content, message_type, metadata, created_at
+FROM (
+    SELECT rowid, * FROM recall_memory
+    WHERE agent_id = ?
+    ORDER BY rowid DESC
+    LIMIT ?
+)
+ORDER BY rowid
+"""
+
+# Most relevant first, newest first among equally relevant messages
+_SQL_SEARCH_MESSAGES_FTS = """
+SELECT m.id, m.sender_id, m.receiver_id, m.content, m.message_type, m.metadata, m.created_at
+FROM recall_fts f JOIN recall_memory m ON m.rowid = f.rowid
+WHERE recall_fts MATCH ? AND m.agent_id = ?
+ORDER BY bm25(recall_fts), m.rowid DESC
+LIMIT ?
+"""
+
+_SQL_SEARCH_MESSAGES_LIKE = """
+SELECT id, sender_id, receiver_id, content, message_type, metadata, created_at
+FROM recall_memory
+WHERE agent_id = ? AND content LIKE ?
+ORDER BY rowid DESC
+LIMIT ?
+"""
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching every word, each as a prefix.
+    
+    Words are quoted so that FTS5 syntax characters in user input (such as "-", ":"
+    or "*") are treated as text rather than operators.
+    """
+    terms = []
+    for word in query.split():
+        word = word.replace('"', "").strip("-")
+        # Words without letters or digits hold no tokens to match
+        if any(ch.isalnum() for ch in word):
+            terms.append(f'"{word}"*')
+    return " ".join(terms)
 
 
 class Database:
     """Database for storing agent state and memory."""
     
-    def __init__(self, db_path: str = "agents.db"):
+    def __init__(self, db_path: str = "agents.db", search_cache: Optional[SemanticCache] = None, batch_writes: bool = True):
         """Initialize the database.
         
         Args:
             db_path: Path to the SQLite database file
+            search_cache: Cache answering repeated and near-duplicate archival searches (optional)
+            batch_writes: Commit saved messages and archival items in batches from a background thread
         """
         self.db_path = db_path
-        self.conn = None
+        # Each thread gets its own connection, so concurrent requests do not serialize on one
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # An in-memory database is private to its connection, so the writer thread could not share it
+        self.batch_writes = batch_writes and db_path != ":memory:"
+        self._writes: Optional[WriteQueue] = None
+        self.search_cache = search_cache
+        self.fts_enabled = False
         self.initialize()
     
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.db_path == ":memory:" and self._connections:
+                # Every connection to :memory: would be a separate empty database
+                conn = self._connections[0]
+            else:
+                conn = self._connect()
+            self._local.conn = conn
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        
+        # Write-ahead logging lets readers proceed during writes, and synchronous=NORMAL only
+        # fsyncs at checkpoints rather than on every commit while remaining crash-safe in WAL mode.
+        # The remaining pragmas are per connection
+        conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-20000;
+        PRAGMA mmap_size=268435456;
+        """)
+        
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
     def initialize(self) -> None:
         """Initialize the database schema."""
         # Create database directory if it doesn't exist
         os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
         
-        # Connect to the database
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        
         # Create tables
         cursor = self.conn.cursor()
         
@@ -65,7 +230,7 @@ class Database:
             id TEXT PRIMARY KEY,
             agent_id TEXT NOT NULL,
             content TEXT NOT NULL,
-            metadata TEXT,
+            metadata BLOB,
             embedding TEXT,
             created_at INTEGER,
             FOREIGN KEY (agent_id) REFERENCES agents(id)
@@ -87,18 +252,105 @@ class Database:
         )
         """)
         
-        # Create indices
+        # Create indices. Messages are read newest-first by rowid, which follows insertion
+        # order and is already the trailing key of the agent_id index, so the recent-messages
+        # query is an index seek with no sort step even when timestamps tie within a second.
+        # Archival items are listed newest-first by created_at, so that index walks an agent's
+        # items in that order and the query stops after LIMIT rows instead of sorting them all
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_blocks_agent_id ON memory_blocks(agent_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_archival_memory_agent_id ON archival_memory(agent_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_archival_agent_time ON archival_memory(agent_id, created_at DESC)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_recall_memory_agent_id ON recall_memory(agent_id)")
+        # The composite index serves every agent_id lookup the single-column one did
+        cursor.execute("DROP INDEX IF EXISTS idx_archival_memory_agent_id")
+        
+        self._create_fts_indexes(cursor)
         
         self.conn.commit()
+        
+        if self.batch_writes:
+            self._writes = WriteQueue(self.db_path)
+    
+    def _write(self, sql: str, params: Tuple[Any, ...]) -> None:
+        """Execute an INSERT, through the write queue when writes are batched."""
+        if self._writes is not None:
+            self._writes.put(sql, params)
+        else:
+            self.conn.execute(sql, params)
+            self.conn.commit()
+    
+    def _write_many(self, sql: str, rows: List[Tuple[Any, ...]]) -> None:
+        """Execute an INSERT for each row, in one transaction when writes are not batched."""
+        if self._writes is not None:
+            self._writes.put_many(sql, rows)
+        else:
+            self.conn.executemany(sql, rows)
+            self.conn.commit()
+    
+    def flush(self) -> None:
+        """Wait until every queued write has been committed.
+        
+        Reads of messages and archival memory call this first, so they always see earlier saves.
+        """
+        if self._writes is not None:
+            self._writes.flush()
+    
+    def _create_fts_indexes(self, cursor: sqlite3.Cursor) -> None:
+        """Create the FTS5 indexes used for searching, if this SQLite build supports FTS5."""
+        for fts_table, table in _FTS_TABLES.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts_table,))
+            if cursor.fetchone():
+                continue
+            
+            try:
+                cursor.execute(f"""
+                CREATE VIRTUAL TABLE {fts_table} USING fts5(
+                    content, content='{table}', content_rowid='rowid', tokenize='porter unicode61'
+                )
+                """)
+            except sqlite3.OperationalError:
+                # SQLite was built without FTS5, so searches fall back to LIKE
+                self.fts_enabled = False
+                return
+            
+            cursor.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table}(rowid, content) VALUES (new.rowid, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, content) VALUES ('delete', old.rowid, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF content ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, content) VALUES ('delete', old.rowid, old.content);
+                INSERT INTO {fts_table}(rowid, content) VALUES (new.rowid, new.content);
+            END;
+            """)
+            
+            # Index rows written before the index existed
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+        
+        self.fts_enabled = True
     
     def close(self) -> None:
-        """Close the database connection."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """Close every thread's database connection, raising any queued write that failed."""
+        writes, self._writes = self._writes, None
+        try:
+            if writes is not None:
+                writes.close()
+        finally:
+            self._close_connections()
+    
+    def _close_connections(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        if connections:
+            # Fold the write-ahead log back into the main database file
+            connections[0].execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        for conn in connections:
+            conn.close()
+        
+        # Threads that use the database again afterwards open fresh connections
+        self._local = threading.local()
     
     def save_agent(self, agent_data: Dict[str, Any]) -> str:
         """Save or update an agent.
@@ -109,53 +361,21 @@ class Database:
         Returns:
             The agent ID
         """
-        cursor = self.conn.cursor()
-        
-        # Check if agent already exists
         agent_id = agent_data.get("id")
-        cursor.execute("SELECT id FROM agents WHERE id = ?", (agent_id,))
-        
         current_time = int(time.time())
         
-        if cursor.fetchone():
-            # Update existing agent
-            cursor.execute("""
-            UPDATE agents SET
-                name = ?,
-                model = ?,
-                persona = ?,
-                system_prompt = ?,
-                context_window_limit = ?,
-                active = ?,
-                updated_at = ?
-            WHERE id = ?
-            """, (
-                agent_data.get("name"),
-                agent_data.get("model"),
-                agent_data.get("persona", ""),
-                agent_data.get("system_prompt", ""),
-                agent_data.get("context_window_limit", 4096),
-                agent_data.get("active", True),
-                current_time,
-                agent_id
-            ))
-        else:
-            # Insert new agent
-            cursor.execute("""
-            INSERT INTO agents (
-                id, name, model, persona, system_prompt, context_window_limit, active, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                agent_id,
-                agent_data.get("name"),
-                agent_data.get("model"),
-                agent_data.get("persona", ""),
-                agent_data.get("system_prompt", ""),
-                agent_data.get("context_window_limit", 4096),
-                agent_data.get("active", True),
-                current_time,
-                current_time
-            ))
+        # A single upsert rather than a lookup followed by an UPDATE or INSERT
+        self.conn.execute(_SQL_UPSERT_AGENT, (
+            agent_id,
+            agent_data.get("name"),
+            agent_data.get("model"),
+            agent_data.get("persona", ""),
+            agent_data.get("system_prompt", ""),
+            agent_data.get("context_window_limit", 4096),
+            agent_data.get("active", True),
+            current_time,
+            current_time
+        ))
         
         self.conn.commit()
         return agent_id
@@ -169,9 +389,7 @@ class Database:
         Returns:
             Dictionary containing agent data, or None if not found
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM agents WHERE id = ?", (agent_id,))
-        row = cursor.fetchone()
+        row = self.conn.execute(_SQL_GET_AGENT, (agent_id,)).fetchone()
         
         if not row:
             return None
@@ -189,41 +407,17 @@ class Database:
         Returns:
             The memory block ID
         """
-        cursor = self.conn.cursor()
-        
-        # Check if memory block already exists
         block_id = f"{agent_id}-{key}"
-        cursor.execute("SELECT id FROM memory_blocks WHERE agent_id = ? AND key = ?", (agent_id, key))
-        
         current_time = int(time.time())
         
-        if cursor.fetchone():
-            # Update existing memory block
-            cursor.execute("""
-            UPDATE memory_blocks SET
-                value = ?,
-                updated_at = ?
-            WHERE agent_id = ? AND key = ?
-            """, (
-                value,
-                current_time,
-                agent_id,
-                key
-            ))
-        else:
-            # Insert new memory block
-            cursor.execute("""
-            INSERT INTO memory_blocks (
-                id, agent_id, key, value, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                block_id,
-                agent_id,
-                key,
-                value,
-                current_time,
-                current_time
-            ))
+        self.conn.execute(_SQL_UPSERT_MEMORY_BLOCK, (
+            block_id,
+            agent_id,
+            key,
+            value,
+            current_time,
+            current_time
+        ))
         
         self.conn.commit()
         return block_id
@@ -237,10 +431,7 @@ class Database:
         Returns:
             Dictionary mapping keys to values
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT key, value FROM memory_blocks WHERE agent_id = ?", (agent_id,))
-        
-        return {row["key"]: row["value"] for row in cursor.fetchall()}
+        return dict(self.conn.execute(_SQL_GET_MEMORY_BLOCKS, (agent_id,)).fetchall())
     
     def save_archival_memory(self, agent_id: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Save an item to archival memory.
@@ -253,24 +444,21 @@ class Database:
         Returns:
             The memory item ID
         """
-        cursor = self.conn.cursor()
-        
         current_time = int(time.time())
-        item_id = f"arch-{agent_id}-{current_time}"
+        # Random IDs stay unique however many items are saved in the same second
+        item_id = f"arch-{secrets.token_urlsafe(12)}"
         
-        cursor.execute("""
-        INSERT INTO archival_memory (
-            id, agent_id, content, metadata, created_at
-        ) VALUES (?, ?, ?, ?, ?)
-        """, (
+        self._write(_SQL_INSERT_ARCHIVAL, (
             item_id,
             agent_id,
             content,
-            json.dumps(metadata or {}),
+            _pack_metadata(metadata or {}),
             current_time
         ))
         
-        self.conn.commit()
+        if self.search_cache is not None:
+            self.search_cache.clear(agent_id)
+        
         return item_id
     
     def search_archival_memory(self, agent_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
@@ -284,23 +472,37 @@ class Database:
         Returns:
             List of memory items
         """
+        if self.search_cache is None:
+            return self._search_archival_memory(agent_id, query, limit)
+        
+        scope = (agent_id, "archival", limit)
+        results = self.search_cache.get(scope, query)
+        if results is None:
+            results = self._search_archival_memory(agent_id, query, limit)
+            self.search_cache.put(scope, query, results)
+        
+        return results
+    
+    def _search_archival_memory(self, agent_id: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Search archival memory for an agent without the search cache."""
+        self.flush()
         cursor = self.conn.cursor()
         
-        # Simple text search for now - would be replaced with vector search
-        cursor.execute("""
-        SELECT id, content, metadata, created_at 
-        FROM archival_memory 
-        WHERE agent_id = ? AND content LIKE ? 
-        ORDER BY created_at DESC
-        LIMIT ?
-        """, (agent_id, f"%{query}%", limit))
+        if self.fts_enabled:
+            match = _fts_query(query)
+            if not match:
+                return []
+            
+            cursor.execute(_SQL_SEARCH_ARCHIVAL_FTS, (match, agent_id, limit))
+        else:
+            cursor.execute(_SQL_SEARCH_ARCHIVAL_LIKE, (agent_id, f"%{query}%", limit))
         
         results = []
         for row in cursor.fetchall():
             results.append({
                 "id": row["id"],
                 "content": row["content"],
-                "metadata": json.loads(row["metadata"]),
+                "metadata": _decode_archival_metadata(row["metadata"]),
                 "timestamp": row["created_at"]
             })
         
@@ -321,28 +523,37 @@ class Database:
         Returns:
             The message ID
         """
-        cursor = self.conn.cursor()
+        return self.save_messages(agent_id, [(sender_id, receiver_id, content, metadata)], message_type)[0]
+    
+    def save_messages(self, agent_id: str, messages: List[Tuple[str, str, str, Optional[Dict[str, Any]]]],
+                      message_type: str = "text") -> List[str]:
+        """Save several messages to recall memory with a single executemany.
         
+        Args:
+            agent_id: The agent ID
+            messages: (sender ID, receiver ID, content, metadata) of each message, in order
+            message_type: Type of the messages
+            
+        Returns:
+            The message IDs, in the same order
+        """
         current_time = int(time.time())
-        message_id = f"msg-{agent_id}-{current_time}"
+        rows = []
+        for sender_id, receiver_id, content, metadata in messages:
+            rows.append((
+                f"msg-{secrets.token_urlsafe(12)}",
+                agent_id,
+                sender_id,
+                receiver_id,
+                content,
+                message_type,
+                _metadata_encoder.encode(metadata or {}).decode(),
+                current_time
+            ))
         
-        cursor.execute("""
-        INSERT INTO recall_memory (
-            id, agent_id, sender_id, receiver_id, content, message_type, metadata, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            message_id,
-            agent_id,
-            sender_id,
-            receiver_id,
-            content,
-            message_type,
-            json.dumps(metadata or {}),
-            current_time
-        ))
+        self._write_many(_SQL_INSERT_MESSAGE, rows)
         
-        self.conn.commit()
-        return message_id
+        return [row[0] for row in rows]
     
     def get_recent_messages(self, agent_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent messages for an agent.
@@ -354,29 +565,51 @@ class Database:
         Returns:
             List of messages
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        SELECT id, sender_id, receiver_id, content, message_type, metadata, created_at
-        FROM recall_memory
-        WHERE agent_id = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-        """, (agent_id, limit))
+        return [message for batch in self.iter_recent_messages(agent_id, limit) for message in batch]
+    
+    def iter_recent_messages(self, agent_id: str, limit: int = 10, batch_size: int = 256,
+                             raw_metadata: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """Get recent messages for an agent a batch at a time, so they need not all be held in memory.
         
-        messages = []
-        for row in cursor.fetchall():
-            messages.append({
-                "id": row["id"],
-                "sender_id": row["sender_id"],
-                "receiver_id": row["receiver_id"],
-                "content": row["content"],
-                "message_type": row["message_type"],
-                "metadata": json.loads(row["metadata"]),
-                "timestamp": row["created_at"]
-            })
+        The rows are read through a read-only connection of their own, opened for the
+        iteration, so the generator can be advanced from any thread.
         
-        # Return in chronological order
-        return list(reversed(messages))
+        Args:
+            agent_id: The agent ID
+            limit: Maximum number of messages
+            batch_size: Number of messages per batch
+            raw_metadata: Leave each message's metadata as the stored JSON text instead of decoding it
+            
+        Yields:
+            Lists of up to batch_size messages, in chronological order
+        """
+        self.flush()
+        if self.db_path == ":memory:":
+            conn, owned = self.conn, False
+        else:
+            # as_uri() percent-encodes characters such as '#', '?' and '%' that would end the path
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn, owned = sqlite3.connect(uri, uri=True, check_same_thread=False), True
+        
+        try:
+            cursor = conn.execute(_SQL_RECENT_MESSAGES, (agent_id, limit))
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [{
+                    "id": message_id,
+                    "sender_id": sender_id,
+                    "receiver_id": receiver_id,
+                    "content": content,
+                    "message_type": message_type,
+                    "metadata": (metadata or "{}") if raw_metadata else _metadata_decoder.decode(metadata),
+                    "timestamp": created_at
+                } for message_id, sender_id, receiver_id, content, message_type, metadata, created_at in rows]
+        finally:
+            if owned:
+                conn.close()
     
     def search_messages(self, agent_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Search messages for an agent.
@@ -389,14 +622,17 @@ class Database:
         Returns:
             List of messages
         """
+        self.flush()
         cursor = self.conn.cursor()
-        cursor.execute("""
-        SELECT id, sender_id, receiver_id, content, message_type, metadata, created_at
-        FROM recall_memory
-        WHERE agent_id = ? AND content LIKE ?
-        ORDER BY created_at DESC
-        LIMIT ?
-        """, (agent_id, f"%{query}%", limit))
+        
+        if self.fts_enabled:
+            match = _fts_query(query)
+            if not match:
+                return []
+            
+            cursor.execute(_SQL_SEARCH_MESSAGES_FTS, (match, agent_id, limit))
+        else:
+            cursor.execute(_SQL_SEARCH_MESSAGES_LIKE, (agent_id, f"%{query}%", limit))
         
         messages = []
         for row in cursor.fetchall():
@@ -406,7 +642,7 @@ class Database:
                 "receiver_id": row["receiver_id"],
                 "content": row["content"],
                 "message_type": row["message_type"],
-                "metadata": json.loads(row["metadata"]),
+                "metadata": _metadata_decoder.decode(row["metadata"]),
                 "timestamp": row["created_at"]
             })
         
@@ -1,14 +1,41 @@
-from typing import Dict, List, Optional, Any, Union
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple, Union
+import asyncio
+import os
+import secrets
 import time
-import uuid
 import threading
+import orjson
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from .database import Database
 from ..agent import Agent
 from ..memory import MemoryManager
 from ..tools import ToolManager
+from ..tokens import get_encoding
+
+
+# Environment variable through which run_workers() hands the database path to worker processes
+_DB_PATH_ENV = "STATEFUL_AGENTS_DB_PATH"
+
+
+def _message_line(message: Dict[str, Any]) -> bytes:
+    """Encode a message read with raw metadata as an NDJSON line, splicing in the stored metadata JSON as is."""
+    metadata = message.pop("metadata")
+    return orjson.dumps(message)[:-1] + b',"metadata":' + metadata.encode() + b"}\n"
+
+
+class _OrjsonResponse(JSONResponse):
+    """JSON response encoded with orjson.
+
+    Used instead of FastAPI's ORJSONResponse, which newer releases deprecate with a warning
+    on every app start, while the older releases still supported send bodies through the
+    standard library json module.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
 
 
 class CreateAgentRequest(BaseModel):
@@ -29,18 +56,31 @@ class MessageRequest(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
+class MessagesRequest(BaseModel):
+    """Request model for sending several consecutive messages to an agent."""
+    
+    messages: List[str]
+    sender_id: Optional[str] = "user"
+    metadata: Optional[Dict[str, Any]] = None
+
+
 class Server:
     """Server for managing stateful agents."""
     
-    def __init__(self, db_path: str = "agents.db"):
+    def __init__(self, db_path: str = "agents.db", embedder: Optional[Callable[[List[str]], Any]] = None):
         """Initialize the server.
         
         Args:
             db_path: Path to the SQLite database file
+            embedder: Embedding model shared by every agent's archival memory
         """
         self.database = Database(db_path)
+        self.embedder = embedder
         self.agents: Dict[str, Agent] = {}
-        self.app = FastAPI(title="Stateful Agent Server")
+        # One lock per agent, held while a request runs or changes that agent; Agent is not thread-safe,
+        # so turns handed to worker threads must not overlap
+        self._agent_locks: Dict[str, asyncio.Lock] = {}
+        self.app = FastAPI(title="Stateful Agent Server", default_response_class=_OrjsonResponse)
         self._setup_routes()
     
     def _setup_routes(self):
@@ -48,20 +88,21 @@ class Server:
         @self.app.post("/agents")
         async def create_agent(request: CreateAgentRequest):
             """Create a new agent."""
-            agent_id = f"agent-{uuid.uuid4().hex[:8]}"
-            
-            # Save agent to database
-            self.database.save_agent({
+            agent_id = f"agent-{secrets.token_urlsafe(9)}"
+            agent_data = {
                 "id": agent_id,
                 "name": request.name,
                 "model": request.model,
                 "persona": request.persona,
                 "system_prompt": request.system_prompt,
                 "context_window_limit": request.context_window_limit
-            })
+            }
             
-            # Initialize agent instance
-            agent = self._load_agent(agent_id)
+            # Save agent to database on a worker thread while the instance is built from the same data,
+            # rather than reading back what was just written
+            saved = asyncio.create_task(asyncio.to_thread(self.database.save_agent, agent_data))
+            agent = self._build_agent(agent_id, {**agent_data, "active": True}, {})
+            await saved
             
             return {
                 "id": agent_id,
@@ -72,7 +113,7 @@ class Server:
         @self.app.get("/agents/{agent_id}")
         async def get_agent(agent_id: str):
             """Get agent details."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
             return {
                 "id": agent.id,
@@ -86,14 +127,24 @@ class Server:
         @self.app.post("/agents/{agent_id}/messages")
         async def send_message(agent_id: str, request: MessageRequest):
             """Send a message to an agent."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
-            # Process message
-            response = agent.send_message(
-                message=request.content,
-                user_id=request.sender_id,
-                metadata=request.metadata
-            )
+            # Process message in a worker thread so requests to other agents can proceed meanwhile,
+            # one turn at a time per agent
+            async with self._agent_lock(agent_id):
+                response = await asyncio.to_thread(
+                    agent.send_message,
+                    message=request.content,
+                    user_id=request.sender_id,
+                    metadata=request.metadata
+                )
+                
+                # Persist both turns so the recent-messages endpoint can serve them straight from SQL
+                sender_id = request.sender_id or "user"
+                self.database.save_messages(agent_id, [
+                    (sender_id, agent_id, request.content, request.metadata),
+                    (agent_id, sender_id, response, None)
+                ])
             
             return {
                 "response": response,
@@ -101,50 +152,93 @@ class Server:
                 "timestamp": int(time.time())
             }
         
+        @self.app.post("/agents/{agent_id}/messages/batch")
+        async def send_messages(agent_id: str, request: MessagesRequest):
+            """Send several consecutive messages to an agent in one request."""
+            agent = await self._get_agent(agent_id)
+            
+            # The turns depend on each other, so they run in order, but in a single worker thread hop,
+            # and never interleaved with other turns of the same agent
+            async with self._agent_lock(agent_id):
+                responses = await asyncio.to_thread(
+                    agent.send_messages,
+                    request.messages,
+                    user_id=request.sender_id,
+                    metadata=request.metadata
+                )
+                
+                sender_id = request.sender_id or "user"
+                rows = []
+                for content, response in zip(request.messages, responses):
+                    rows.append((sender_id, agent_id, content, request.metadata))
+                    rows.append((agent_id, sender_id, response, None))
+                self.database.save_messages(agent_id, rows)
+            
+            return {
+                "responses": responses,
+                "agent_id": agent_id,
+                "timestamp": int(time.time())
+            }
+        
         @self.app.get("/agents/{agent_id}/memory/core")
         async def get_core_memory(agent_id: str):
             """Get all core memory for an agent."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
-            return agent.memory_manager.get_all_core_memory()
+            # A turn running on a worker thread may be editing core blocks
+            async with self._agent_lock(agent_id):
+                return agent.memory_manager.get_all_core_memory()
         
         @self.app.post("/agents/{agent_id}/memory/core/{key}")
         async def update_core_memory(agent_id: str, key: str, value: str):
             """Update a core memory block."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
-            agent.memory_manager.add_core_memory(key, value)
+            async with self._agent_lock(agent_id):
+                agent.memory_manager.add_core_memory(key, value)
             
             return {"status": "success"}
         
         @self.app.get("/agents/{agent_id}/memory/recall")
         async def get_recent_messages(agent_id: str, limit: int = 10):
             """Get recent messages for an agent."""
-            self._get_agent(agent_id)  # Just to verify agent exists
+            await self._get_agent(agent_id)  # Just to verify agent exists
             
-            messages = self.database.get_recent_messages(agent_id, limit)
+            # Stream one message per line, a batch of rows at a time, instead of building the
+            # whole list. Starlette advances the generator on worker threads, so reading the
+            # rows does not block the event loop
+            def lines() -> Iterator[bytes]:
+                for batch in self.database.iter_recent_messages(agent_id, limit, raw_metadata=True):
+                    yield b"".join(map(_message_line, batch))
             
-            return messages
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
         
         @self.app.post("/agents/{agent_id}/memory/archival")
         async def add_to_archival(agent_id: str, content: str, metadata: Optional[Dict[str, Any]] = None):
             """Add content to archival memory."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
-            memory_id = agent.memory_manager.add_to_archival(content, metadata)
+            async with self._agent_lock(agent_id):
+                memory_id = agent.memory_manager.add_to_archival(content, metadata)
             
             return {"memory_id": memory_id}
         
         @self.app.get("/agents/{agent_id}/memory/archival/search")
         async def search_archival(agent_id: str, query: str, limit: int = 5):
             """Search archival memory."""
-            agent = self._get_agent(agent_id)
+            agent = await self._get_agent(agent_id)
             
-            results = agent.memory_manager.search_archival(query, limit)
+            # Compaction in a running turn adds archival items, so searches wait for it
+            async with self._agent_lock(agent_id):
+                results = agent.memory_manager.search_archival(query, limit)
             
             return results
     
-    def _get_agent(self, agent_id: str) -> Agent:
+    def _agent_lock(self, agent_id: str) -> asyncio.Lock:
+        """Get the lock serializing the requests that run or change an agent."""
+        return self._agent_locks.setdefault(agent_id, asyncio.Lock())
+    
+    async def _get_agent(self, agent_id: str) -> Agent:
         """Get an agent instance, loading it if necessary.
         
         Args:
@@ -156,17 +250,18 @@ class Server:
         Raises:
             HTTPException: If the agent does not exist
         """
-        if agent_id not in self.agents:
-            # Try to load from database
-            agent_data = self.database.get_agent(agent_id)
-            if not agent_data:
-                raise HTTPException(status_code=404, detail=f"Agent {agent_id} not found")
-            
-            self._load_agent(agent_id)
+        agent = self.agents.get(agent_id)
+        if agent is not None:
+            return agent
         
-        return self.agents[agent_id]
+        # Try to load from database
+        agent_data, memory_blocks = await self._fetch_agent_state(agent_id)
+        if not agent_data:
+            raise HTTPException(status_code=404, detail=f"Agent {agent_id} not found")
+        
+        return self._build_agent(agent_id, agent_data, memory_blocks)
     
-    def _load_agent(self, agent_id: str) -> Agent:
+    async def _load_agent(self, agent_id: str) -> Agent:
         """Load an agent from the database.
         
         Args:
@@ -175,16 +270,37 @@ class Server:
         Returns:
             The loaded agent instance
         """
-        # Get agent data from database
-        agent_data = self.database.get_agent(agent_id)
+        agent_data, memory_blocks = await self._fetch_agent_state(agent_id)
         if not agent_data:
             raise ValueError(f"Agent {agent_id} not found in database")
         
-        # Create memory manager
-        memory_manager = MemoryManager()
+        return self._build_agent(agent_id, agent_data, memory_blocks)
+    
+    async def _fetch_agent_state(self, agent_id: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """Fetch an agent's row and core memory blocks concurrently, each on its own worker thread."""
+        return await asyncio.gather(
+            asyncio.to_thread(self.database.get_agent, agent_id),
+            asyncio.to_thread(self.database.get_memory_blocks, agent_id)
+        )
+    
+    def _build_agent(self, agent_id: str, agent_data: Dict[str, Any], memory_blocks: Dict[str, str]) -> Agent:
+        """Create an agent instance from its stored data and cache it.
+        
+        Args:
+            agent_id: The agent ID
+            agent_data: The agent's row from the database
+            memory_blocks: The agent's core memory blocks
+            
+        Returns:
+            The cached agent instance
+        """
+        # Create memory manager; the embedder and tokenizer are loaded once and shared by all agents
+        memory_manager = MemoryManager(
+            embedder=self.embedder,
+            tokenizer=get_encoding(agent_data["model"])
+        )
         
         # Load core memory blocks
-        memory_blocks = self.database.get_memory_blocks(agent_id)
         for key, value in memory_blocks.items():
             memory_manager.add_core_memory(key, value)
         
@@ -199,11 +315,10 @@ class Server:
             context_window_limit=agent_data["context_window_limit"],
             active=bool(agent_data["active"])
         )
+        agent.tool_manager.add_memory_search_tool(memory_manager)
         
-        # Cache agent
-        self.agents[agent_id] = agent
-        
-        return agent
+        # Cache agent, keeping the first instance if concurrent requests loaded it at the same time
+        return self.agents.setdefault(agent_id, agent)
     
     def run(self, host: str = "0.0.0.0", port: int = 8000):
         """Run the server.
@@ -215,8 +330,35 @@ class Server:
         import uvicorn
         uvicorn.run(self.app, host=host, port=port)
     
+    def run_workers(self, workers: Optional[int] = None, host: str = "0.0.0.0", port: int = 8000):
+        """Run the server in several worker processes, so CPU-bound work such as tokenization
+        runs on all cores instead of contending for one GIL.
+        
+        Each worker builds its own Server on this server's database file, which WAL mode
+        lets the processes share. The embedder is not passed on. Agent state is per process:
+        a worker loads only an agent's settings and core memory from the database, never its
+        conversation history, and core memory edits, archival memory and turns stay in the
+        worker that handled them. Route every request for an agent to the same worker (a
+        sticky load balancer keyed on the agent ID). uvloop and httptools are used when
+        installed (pip install "uvicorn[standard]").
+        
+        Args:
+            workers: Number of worker processes (one per CPU if not provided)
+            host: Host to bind to
+            port: Port to bind to
+        """
+        import uvicorn
+        if self.database.db_path == ":memory:":
+            raise ValueError("Worker processes cannot share an in-memory database")
+        
+        # Worker processes import the app, so they learn the database through the environment
+        os.environ[_DB_PATH_ENV] = os.path.abspath(self.database.db_path)
+        uvicorn.run(f"{__name__}:create_app", factory=True, host=host, port=port, workers=workers or os.cpu_count() or 1)
+    
     def run_in_thread(self, host: str = "0.0.0.0", port: int = 8000):
-        """Run the server in a background thread.
+        """Run the server in a background thread, for development and tests.
+        
+        Everything runs in this process under one GIL; use run_workers() for production loads.
         
         Args:
             host: Host to bind to
@@ -233,4 +375,9 @@ class Server:
     
     def close(self):
         """Close the server and database connection."""
-        self.database.close()
\ No newline at end of file
+        self.database.close()
+
+
+def create_app() -> FastAPI:
+    """Create the app for a worker process started by Server.run_workers()."""
+    return Server(db_path=os.environ.get(_DB_PATH_ENV, "agents.db")).app
@@ -0,0 +1,199 @@
+from typing import List, Optional, Tuple, Any, Union
+from itertools import groupby
+from operator import itemgetter
+import queue
+import sqlite3
+import threading
+import time
+
+
+# Most failed-statement exceptions kept until the next flush() or close() reports them
+MAX_PENDING_ERRORS = 100
+
+
+class WriteError(Exception):
+    """Several queued statements failed; the individual exceptions are in errors.
+
+    If more failed than MAX_PENDING_ERRORS, only the first ones are kept and dropped
+    counts the rest.
+    """
+
+    def __init__(self, errors: List[Exception], dropped: int = 0):
+        total = len(errors) + dropped
+        super().__init__(f"{total} queued statements failed, first: {errors[0]!r}")
+        self.errors = errors
+        self.dropped = dropped
+
+
+class WriteQueue:
+    """Background writer that commits queued statements in batches, one transaction per batch.
+
+    Statements are applied in the order they were queued. A batch is committed once it
+    holds batch_size statements, flush_interval seconds after its first statement, or as
+    soon as someone calls flush(), so one fsync covers many rows.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 50, flush_interval: float = 0.05):
+        """Start the writer thread.
+
+        Args:
+            db_path: Path to the SQLite database file
+            batch_size: Maximum number of statements committed together
+            flush_interval: Seconds to wait for more statements before committing a partial batch
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # The writer has its own connection in autocommit mode so it controls its transactions
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # One cursor for the writer's lifetime instead of a new one per statement
+        self._cursor = self._conn.cursor()
+
+        # Items are (sql, params) statements, Events to set once everything before them is
+        # committed, or None to stop the writer
+        self._queue: "queue.Queue[Union[Tuple[str, Tuple[Any, ...]], threading.Event, None]]" = queue.Queue()
+        # Exceptions from failed statements not yet reported, raised by the next flush() or
+        # close() whichever thread calls it; statements are often queued from a thread that
+        # never flushes. At most MAX_PENDING_ERRORS are kept, the rest only counted
+        self._errors: List[Exception] = []
+        self._dropped_errors = 0
+        self._errors_lock = threading.Lock()
+        # Exception that stopped the writer thread, if it died
+        self._crash: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sqlite-write-queue", daemon=True)
+        self._thread.start()
+
+    def put(self, sql: str, params: Tuple[Any, ...]) -> None:
+        """Queue a statement to be executed and committed in the background."""
+        self._check_open()
+        self._queue.put((sql, params))
+
+    def put_many(self, sql: str, rows: List[Tuple[Any, ...]]) -> None:
+        """Queue a statement once per row; consecutive rows are executed with one executemany."""
+        self._check_open()
+        for params in rows:
+            self._queue.put((sql, params))
+
+    def _check_open(self) -> None:
+        if self._crash is not None:
+            raise RuntimeError("Write queue writer thread died") from self._crash
+        if self._closed:
+            raise RuntimeError("Write queue is closed")
+
+    def flush(self) -> None:
+        """Block until every statement queued so far has been committed.
+
+        Raises:
+            Exception: The error hit executing a queued statement since the last flush() by
+                any thread, or a WriteError holding all of them if several failed
+            RuntimeError: If the writer thread died, so the statements will never be committed
+        """
+        if not self._closed:
+            if self._crash is not None or not self._thread.is_alive():
+                raise RuntimeError("Write queue writer thread died") from self._crash
+            done = threading.Event()
+            self._queue.put(done)
+            while not done.wait(timeout=1.0):
+                if not self._thread.is_alive():
+                    break
+            if not done.is_set() or self._crash is not None:
+                raise RuntimeError("Write queue writer thread died") from self._crash
+
+        self._raise_errors()
+
+    def close(self) -> None:
+        """Commit everything still queued and stop the writer thread.
+
+        Raises:
+            Exception: Errors from queued statements not yet reported, as flush() raises them
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._conn.close()
+        self._raise_errors()
+
+    def _raise_errors(self) -> None:
+        """Raise and forget the errors of failed statements not yet reported."""
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+            dropped, self._dropped_errors = self._dropped_errors, 0
+        if errors:
+            raise errors[0] if len(errors) == 1 and not dropped else WriteError(errors, dropped)
+
+    def _run(self) -> None:
+        try:
+            self._process()
+        except BaseException as e:
+            self._crash = e
+        finally:
+            # Wake anyone waiting, including flushes queued after a crash
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _process(self) -> None:
+        stop = False
+        while not stop:
+            batch: List[Tuple[str, Tuple[Any, ...]]] = []
+            waiters: List[threading.Event] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    # Someone is waiting on this batch, so commit it now
+                    waiters.append(item)
+                    break
+
+                batch.append(item)
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+
+    def _write(self, batch: List[Tuple[str, Tuple[Any, ...]]]) -> None:
+        """Execute a batch in one transaction, with runs of the same statement sent together."""
+        try:
+            self._cursor.execute("BEGIN IMMEDIATE")
+            for sql, statements in groupby(batch, key=itemgetter(0)):
+                self._cursor.executemany(sql, [params for _, params in statements])
+            self._cursor.execute("COMMIT")
+            return
+        except Exception:
+            # Not only sqlite3.Error: binding a bad parameter raises OverflowError and the like
+            if self._conn.in_transaction:
+                self._cursor.execute("ROLLBACK")
+
+        # Retry one statement at a time so a single bad row does not lose the rest of the batch
+        for sql, params in batch:
+            try:
+                self._cursor.execute(sql, params)
+            except Exception as e:
+                with self._errors_lock:
+                    if len(self._errors) < MAX_PENDING_ERRORS:
+                        self._errors.append(e)
+                    else:
+                        self._dropped_errors += 1
@@ -0,0 +1,191 @@
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple, Any
+from collections import OrderedDict
+from functools import lru_cache
+import os
+import tiktoken
+
+
+class CharEncoding:
+    """Stand-in encoder that estimates about four characters per token.
+
+    Used when tiktoken cannot load its BPE files, e.g. offline on first use, so token
+    budgets are approximate instead of every turn failing.
+    """
+
+    chars_per_token = 4
+
+    def encode(self, text: str) -> List[int]:
+        """Return one placeholder token per chars_per_token characters, rounded up."""
+        return [0] * -(-len(text) // self.chars_per_token)
+
+    def encode_batch(self, texts: List[str], num_threads: int = 1) -> List[List[int]]:
+        """Estimate each of several texts."""
+        return [self.encode(text) for text in texts]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Get the token encoder for a model, shared across the whole process.
+
+    Falls back to a CharEncoding estimate if tiktoken's encoding files cannot be loaded.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Fall back to cl100k_base for new models not yet in tiktoken
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken downloads the BPE files on first use, which fails without network access
+        return CharEncoding()
+
+
+class TokenLengthCache:
+    """LRU cache of text lengths in tokens that encodes every cache miss in one batch."""
+
+    def __init__(self, encoding: Any, maxsize: int = 4096, max_text_length: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            encoding: Token encoder used for cache misses
+            maxsize: Number of texts to remember
+            max_text_length: Texts longer than this (in characters) are counted but not cached
+        """
+        self.encoding = encoding
+        self.maxsize = maxsize
+        self.max_text_length = max_text_length
+        self._lengths: "OrderedDict[str, int]" = OrderedDict()
+
+    def count(self, text: str) -> int:
+        """Count the tokens in a text."""
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Count the tokens in each of several texts."""
+        lengths = [self._lengths.get(text) for text in texts]
+        misses = list({text: None for text, length in zip(texts, lengths) if length is None})
+        if not misses:
+            for text in texts:
+                self._lengths.move_to_end(text)
+            return lengths
+
+        # Encode all misses with one call, which tiktoken spreads across threads
+        if len(misses) > 1 and hasattr(self.encoding, "encode_batch"):
+            encoded = self.encoding.encode_batch(misses, num_threads=os.cpu_count() or 1)
+        else:
+            encoded = [self.encoding.encode(text) for text in misses]
+        fresh = {text: len(tokens) for text, tokens in zip(misses, encoded)}
+
+        for text in texts:
+            if text in fresh:
+                if self.max_text_length is None or len(text) <= self.max_text_length:
+                    self._lengths[text] = fresh[text]
+            elif text in self._lengths:
+                self._lengths.move_to_end(text)
+        while len(self._lengths) > self.maxsize:
+            self._lengths.popitem(last=False)
+
+        return [fresh[text] if length is None else length for text, length in zip(texts, lengths)]
+
+    def clear(self) -> None:
+        """Forget all cached lengths."""
+        self._lengths.clear()
+
+
+class TokenEstimator:
+    """Counts tokens, caching results per memory block so only changed blocks are re-encoded."""
+
+    def __init__(self, model: str = "gpt-4-turbo", text_cache_size: int = 4096, encoding: Optional[Any] = None):
+        """Initialize the estimator.
+
+        Args:
+            model: Model whose tokenizer should be used
+            text_cache_size: Number of un-keyed texts (e.g. messages) to memoize
+            encoding: Already-loaded token encoder to use instead of looking one up for the model
+        """
+        self.model = model
+        self.encoding = encoding if encoding is not None else get_encoding(model)
+        self._blocks: Dict[Hashable, Tuple[Optional[int], int]] = {}
+        self._text_lengths = TokenLengthCache(self.encoding, maxsize=text_cache_size)
+
+    def _encode_length(self, text: str) -> int:
+        """Encode a text and return its length in tokens."""
+        return len(self.encoding.encode(text))
+
+    def count(self, text: str, block_id: Optional[Hashable] = None, version: Optional[int] = None) -> int:
+        """Count the tokens in a text.
+
+        When a block ID is given, the count is cached under that ID and only
+        recomputed once the block's version changes.
+        """
+        if block_id is None:
+            return self._text_lengths.count(text)
+
+        cached = self._blocks.get(block_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        tokens = self._encode_length(text)
+        self._blocks[block_id] = (version, tokens)
+        return tokens
+
+    def count_memory(self, memory_manager: Any) -> Dict[str, int]:
+        """Count the tokens held in core and recall memory.
+
+        Core memory blocks are cached by key and version, recall messages by
+        their text, so a call only re-encodes what changed since the last one.
+        """
+        core_memory = memory_manager.core_memory
+        live_blocks = {}
+        core_tokens = 0
+        for key, value in core_memory.blocks.items():
+            block_id = ("core", key)
+            core_tokens += self.count(value, block_id=block_id, version=core_memory.get_version(key))
+            live_blocks[block_id] = self._blocks[block_id]
+
+        # Drop blocks that were deleted since the last call
+        self._blocks = live_blocks
+
+        recall_tokens = sum(self._text_lengths.count_many([
+            msg.content if hasattr(msg, "content") else str(msg)
+            for msg in memory_manager.recall_memory.messages
+        ]))
+
+        return {
+            "core_memory": core_tokens,
+            "recall_memory": recall_tokens,
+            "total": core_tokens + recall_tokens
+        }
+
+    def clear(self) -> None:
+        """Clear all cached counts."""
+        self._blocks.clear()
+        self._text_lengths.clear()
+
+
+class BudgetAllocation(NamedTuple):
+    """How a context window is split between memory and conversation history."""
+
+    history_tokens: int
+    memory_tokens: int
+
+
+class ContextBudget:
+    """Splits a model's context window into fixed memory and variable history portions."""
+
+    @staticmethod
+    def allocate(total: int, system: int, core: int, reserve: int) -> BudgetAllocation:
+        """Allocate a context window.
+
+        Args:
+            total: Size of the context window in tokens
+            system: Tokens taken by the system prompt
+            core: Tokens taken by core memory
+            reserve: Tokens kept free for the model's response
+
+        Returns:
+            The number of tokens left for conversation history and the number used by memory
+        """
+        memory_tokens = system + core
+        history_tokens = max(0, total - memory_tokens - reserve)
+        return BudgetAllocation(history_tokens=history_tokens, memory_tokens=memory_tokens)
@@ -1,5 +1,7 @@
-from typing import Dict, List, Optional, Any, Callable
-from pydantic import BaseModel, Field
+from typing import Dict, FrozenSet, List, Optional, Any, Callable
+from pydantic.config import ConfigDict
+from pydantic.fields import Field, PrivateAttr
+from pydantic.main import BaseModel
 
 
 class Tool(BaseModel):
@@ -10,19 +12,28 @@ class Tool(BaseModel):
     parameters: Dict[str, Dict[str, Any]] = Field(default_factory=dict, description="Parameters for the tool")
     function: Optional[Callable] = Field(None, description="Function to execute when the tool is called")
     required_params: List[str] = Field(default_factory=list, description="List of required parameters")
+    category: str = Field("default", description="Category used to shortlist tools by intent, optionally with a subcategory as 'category/subcategory'")
+    is_async: bool = Field(False, description="Whether function is a coroutine function, so calls are awaited rather than run on a worker thread")
+    idempotent: bool = Field(False, description="Whether repeated calls with the same arguments return the same result, so results can be cached")
     
-    class Config:
-        arbitrary_types_allowed = True
+    # Required parameters as a set, built once so execute() checks them with one C-level subset test
+    _required: FrozenSet[str] = PrivateAttr(frozenset())
+    
+    model_config = ConfigDict(defer_build=True)
+    
+    def model_post_init(self, __context: Any) -> None:
+        """Build the required parameter set."""
+        self._required = frozenset(self.required_params)
     
     def execute(self, **kwargs) -> Any:
         """Execute the tool with the given parameters."""
         if self.function is None:
             raise ValueError(f"Tool {self.name} does not have an implementation")
         
-        # Check for required parameters
-        for param in self.required_params:
-            if param not in kwargs:
-                raise ValueError(f"Missing required parameter: {param}")
+        # Check for required parameters, only looking for which one is missing when one is
+        if not self._required <= kwargs.keys():
+            missing = next(param for param in self.required_params if param not in kwargs)
+            raise ValueError(f"Missing required parameter: {missing}")
         
         # Execute the function
         return self.function(**kwargs)
@@ -1,50 +1,606 @@
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Callable, ClassVar, Dict, FrozenSet, List, Optional, Any, Sequence, Tuple, Union
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain
+from operator import itemgetter
+import asyncio
+import heapq
+import threading
+import msgspec
+import numpy as np
+import orjson
 
 from .tool import Tool
-from ..memory.core_memory import CoreMemory
 
+try:
+    from fastjsonschema import JsonSchemaValueException, compile as _compile_json_schema
+except ImportError:
+    # Only needed for ToolManager(validate_arguments=True)
+    JsonSchemaValueException = None
+    _compile_json_schema = None
 
-class ToolManager(BaseModel):
-    """Manages tools for an agent."""
+if TYPE_CHECKING:
+    # Imported only where used, since importing any memory module loads the whole memory package
+    from ..memory.core_memory import CoreMemory
+    from ..memory.memory_manager import MemoryManager
+    from ..memory.vector_index import VectorIndex
+
+
+# A tool call: the tool's name and its arguments
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+@lru_cache(maxsize=1024)
+def _compile_schema(schema: bytes) -> Callable[[Dict[str, Any]], Any]:
+    """Compile a JSON schema, given as JSON with sorted keys, into a validator shared by identical schemas."""
+    return _compile_json_schema(orjson.loads(schema))
+
+
+class ToolManager:
+    """Manages tools for an agent.
+    
+    A plain class with slots rather than a pydantic model: nothing here needs validation,
+    and tool lookups on every turn should be plain attribute reads.
+    """
+    
+    __slots__ = ("agent_id", "session_id", "tools_by_name", "result_cache_size", "embedder", "max_workers",
+                 "validate_arguments", "_version", "_pool", "_trace", "_validators", "_dispatch", "_tool_schemas", "_schemas",
+                 "_results", "_by_category", "_leaf_indexes", "_centroid_sums")
+    
+    # Idempotent tool results of each session, shared by every manager created with that
+    # session ID so they outlive managers recreated on every turn
+    _shared_results: ClassVar[Dict[str, "OrderedDict[Tuple[str, FrozenSet[Tuple[str, Any]]], Any]"]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+    
+    def __init__(self,
+                 agent_id: str,
+                 tools: Optional[List[Tool]] = None,
+                 result_cache_size: int = 256,
+                 embedder: Optional[Callable[[List[str]], Any]] = None,
+                 max_workers: int = 8,
+                 session_id: Optional[str] = None,
+                 validate_arguments: bool = False):
+        """Initialize the tool manager.
+        
+        Args:
+            agent_id: ID of the agent the tools belong to
+            tools: Tools to register, in order
+            result_cache_size: Number of idempotent tool results kept for reuse
+            embedder: Function mapping a list of texts to embedding vectors, enabling
+                get_tool_schemas() and retrieve_tools() to return only the tools relevant to a query
+            max_workers: Number of threads running synchronous tools in parallel
+            session_id: Session whose cached tool results this manager shares with every other
+                manager created for it (results are kept per manager if None)
+            validate_arguments: Whether to check call arguments against each tool's parameter
+                schema before executing it, with validators compiled once per tool by fastjsonschema
+        """
+        if validate_arguments and _compile_json_schema is None:
+            raise ImportError("validate_arguments requires fastjsonschema (pip install fastjsonschema)")
+        
+        self.agent_id = agent_id
+        self.session_id = session_id
+        self.result_cache_size = result_cache_size
+        self.embedder = embedder
+        self.max_workers = max_workers
+        self.validate_arguments = validate_arguments
+        # Argument validators compiled from each tool's parameter schema, keyed by tool name
+        self._validators: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        # Function running each tool's calls from an arguments dict, keyed by tool name, built on
+        # the tool's first call and dropped when the tool is replaced
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        # Registered tools keyed by name, in registration order
+        self.tools_by_name: Dict[str, Tool] = {}
+        # Bumped whenever the set of tools changes
+        self._version = 0
+        # Threads for running synchronous tools in parallel, started on the first batch of calls
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Names of the most recently called tools, oldest first, mined for frequent call sequences
+        self._trace: "deque[str]" = deque(maxlen=10_000)
+        # Each tool's schema keyed by tool name, in registration order, built once when the tool
+        # is registered so serving schemas never goes back to the pydantic model
+        self._tool_schemas: Dict[str, Dict[str, Any]] = {}
+        # Schemas of all tools as a list, built on first request after the set of tools changes
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+        # Results of idempotent tools keyed by (tool name, arguments), least recently used first
+        self._results: "OrderedDict[Tuple[str, FrozenSet[Tuple[str, Any]]], Any]"
+        if session_id is None:
+            self._results = OrderedDict()
+        else:
+            with self._shared_lock:
+                self._results = self._shared_results.setdefault(session_id, OrderedDict())
+        # Tool directory: category -> subcategory -> tools keyed by name, in registration order
+        self._by_category: Dict[str, Dict[str, Dict[str, Tool]]] = {}
+        # Normalized embeddings of each tool's name and description, one index per
+        # (category, subcategory), filled in on the first query after tools are registered
+        # so they are embedded in one batch
+        self._leaf_indexes: Dict[Tuple[str, str], "VectorIndex"] = {}
+        # Sum of the tool embeddings under each (category,) and (category, subcategory) path,
+        # kept up to date as tools come and go; normalized, it is the path's centroid direction
+        self._centroid_sums: Dict[Tuple[str, ...], np.ndarray] = {}
+        
+        for tool in tools or []:
+            self.register_tool(tool)
     
-    agent_id: str
-    tools: List[Tool] = Field(default_factory=list)
+    def __repr__(self) -> str:
+        return f"ToolManager(agent_id={self.agent_id!r}, tools={list(self.tools_by_name)!r})"
     
-    class Config:
-        arbitrary_types_allowed = True
+    def __enter__(self) -> "ToolManager":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Shut down the thread pool used for parallel tool calls, waiting for running calls to finish.
+        
+        The manager stays usable; a later batch starts a new pool.
+        """
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+    
+    @property
+    def tools(self) -> List[Tool]:
+        """Get the registered tools, in registration order."""
+        return list(self.tools_by_name.values())
     
     def register_tool(self, tool: Tool) -> None:
         """Register a tool with the agent."""
-        # Check if a tool with the same name already exists
-        for existing_tool in self.tools:
-            if existing_tool.name == tool.name:
-                # Replace the existing tool
-                self.tools.remove(existing_tool)
-                break
+        # A tool replacing one with the same name moves to the end, as if newly registered
+        replaced = self.tools_by_name.pop(tool.name, None)
+        self._tool_schemas.pop(tool.name, None)
+        self._dispatch.pop(tool.name, None)
+        if replaced is not None:
+            self._unindex_tool(replaced)
+            # Results of a replaced tool must not be served for the new one. A first registration
+            # keeps them, so a manager recreated for a session reuses the session's results
+            for key in [key for key in list(self._results) if key[0] == tool.name]:
+                self._results.pop(key, None)
+        self.tools_by_name[tool.name] = tool
+        # The advertised shape is frozen here; changing the tool afterwards needs a re-registration
+        self._tool_schemas[tool.name] = tool.get_schema()
+        if self.validate_arguments:
+            self._validators[tool.name] = self._compile_validator(tool)
+        category, subcategory = self._split_category(tool.category)
+        self._by_category.setdefault(category, {}).setdefault(subcategory, {})[tool.name] = tool
+        self._version += 1
+        self._schemas = None
+    
+    @classmethod
+    def drain_cache(cls, session_id: str) -> Dict[Tuple[str, FrozenSet[Tuple[str, Any]]], Any]:
+        """Remove and return a session's cached tool results, so they are consumed exactly once.
         
-        self.tools.append(tool)
+        Managers already created for the session keep using the drained results; managers
+        created afterwards start an empty cache.
+        
+        Returns:
+            The session's results keyed by (tool name, arguments), empty if it had none
+        """
+        with cls._shared_lock:
+            return cls._shared_results.pop(session_id, OrderedDict())
+    
+    @property
+    def version(self) -> int:
+        """Get the tool set version, bumped whenever a tool is registered."""
+        return self._version
     
     def get_tool(self, name: str) -> Optional[Tool]:
         """Get a tool by name."""
-        for tool in self.tools:
-            if tool.name == name:
-                return tool
-        return None
+        return self.tools_by_name.get(name)
     
     def execute_tool(self, name: str, **kwargs) -> Any:
-        """Execute a tool by name with the given parameters."""
-        tool = self.get_tool(name)
+        """Execute a tool by name with the given parameters, reusing the cached result of an idempotent tool.
+        
+        For an async tool this returns the coroutine to await, whose result is not cached;
+        use aexecute_tools() to cache it.
+        """
+        run = self._dispatch.get(name)
+        if run is None:
+            run = self._dispatch[name] = self._dispatcher(self._require_tool(name))
+        self._trace.append(name)
+        return run(kwargs)
+    
+    def _dispatcher(self, tool: Tool) -> Callable[[Dict[str, Any]], Any]:
+        """Build the function that runs a tool's calls.
+        
+        Plain synchronous tools get a closure over the tool's function and required parameters,
+        so a call skips the registry lookup and the model's attribute reads; async, idempotent
+        and unimplemented tools go through _call().
+        """
+        if tool.is_async or tool.function is None or (tool.idempotent and self.result_cache_size > 0):
+            return partial(self._call, tool)
+        
+        function = tool.function
+        required = frozenset(tool.required_params)
+        validate = partial(self._validate, tool) if self.validate_arguments else None
+        
+        def run(kwargs: Dict[str, Any]) -> Any:
+            if validate is not None:
+                validate(kwargs)
+            if not required <= kwargs.keys():
+                # Let the tool raise its missing parameter error
+                return tool.execute(**kwargs)
+            return function(**kwargs)
+        
+        return run
+    
+    def _call(self, tool: Tool, kwargs: Dict[str, Any]) -> Any:
+        """Execute a tool without tracing the call, reusing the cached result of an idempotent tool."""
+        if self.validate_arguments:
+            self._validate(tool, kwargs)
+        if tool.is_async:
+            return tool.execute(**kwargs)
+        
+        key = self._result_key(tool, kwargs)
+        if key is None:
+            return tool.execute(**kwargs)
+        
+        try:
+            self._results.move_to_end(key)
+            return self._results[key]
+        except KeyError:
+            pass
+        
+        result = tool.execute(**kwargs)
+        self._remember(key, result)
+        return result
+    
+    def execute_tools(self, calls: Union[Sequence[ToolCall], Sequence[Sequence[ToolCall]]]) -> List[Any]:
+        """Execute independent tool calls in parallel, so a batch takes as long as its slowest call.
+        
+        Synchronous tools run on a shared thread pool and async tools on an event loop in a
+        worker thread. Calls can also be given as waves, lists of calls that run in parallel
+        with each wave starting once the previous one has finished, for calls that depend
+        on earlier results.
+        
+        Args:
+            calls: (name, arguments) pairs, or a list of waves of them
+            
+        Returns:
+            The results in the order of the calls, as one list per wave if waves were given
+            
+        Raises:
+            ValueError: If a tool is not found or is missing a required parameter
+        """
+        flat = self._is_flat(calls)
+        pool = self._executor()
+        
+        results = []
+        for wave in [calls] if flat else calls:
+            futures = [pool.submit(self._execute_call, name, kwargs) for name, kwargs in wave]
+            results.append([future.result() for future in futures])
+        return results[0] if flat else results
+    
+    async def aexecute_tools(self, calls: Union[Sequence[ToolCall], Sequence[Sequence[ToolCall]]]) -> List[Any]:
+        """Execute independent tool calls concurrently from async code.
+        
+        Async tools are awaited directly and synchronous ones run on the shared thread pool.
+        Takes and returns the same shapes as execute_tools().
+        """
+        flat = self._is_flat(calls)
+        results = []
+        for wave in [calls] if flat else calls:
+            results.append(list(await asyncio.gather(*[self._aexecute_one(name, kwargs) for name, kwargs in wave])))
+        return results[0] if flat else results
+    
+    @staticmethod
+    def _is_flat(calls: Union[Sequence[ToolCall], Sequence[Sequence[ToolCall]]]) -> bool:
+        """Check whether a batch is a single list of calls rather than a list of waves (which may be empty)."""
+        if not calls:
+            return False
+        first = calls[0]
+        # A call may also arrive as a [name, arguments] list, e.g. decoded from JSON
+        return isinstance(first, tuple) or (len(first) > 0 and isinstance(first[0], str))
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool for synchronous tools, starting it on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._pool
+    
+    def _execute_call(self, name: str, kwargs: Dict[str, Any]) -> Any:
+        """Execute one call of a batch on a worker thread."""
+        if self._require_tool(name).is_async:
+            return asyncio.run(self._aexecute_one(name, kwargs))
+        return self.execute_tool(name, **kwargs)
+    
+    async def _aexecute_one(self, name: str, kwargs: Dict[str, Any]) -> Any:
+        """Execute one call of a batch, awaiting async tools and running sync ones on the thread pool."""
+        tool = self._require_tool(name)
+        if not tool.is_async:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), partial(self.execute_tool, name, **kwargs))
+        
+        self._trace.append(name)
+        if self.validate_arguments:
+            self._validate(tool, kwargs)
+        key = self._result_key(tool, kwargs)
+        if key is None:
+            return await tool.execute(**kwargs)
+        
+        try:
+            self._results.move_to_end(key)
+            return self._results[key]
+        except KeyError:
+            pass
+        
+        result = await tool.execute(**kwargs)
+        self._remember(key, result)
+        return result
+    
+    def _require_tool(self, name: str) -> Tool:
+        """Get a tool by name, raising if it is not registered."""
+        tool = self.tools_by_name.get(name)
         if tool is None:
             raise ValueError(f"Tool {name} not found")
+        return tool
+    
+    @staticmethod
+    def _compile_validator(tool: Tool) -> Callable[[Dict[str, Any]], Any]:
+        """Get a validator for a tool's arguments, compiled only the first time its schema is seen.
         
-        return tool.execute(**kwargs)
+        Managers recreated every turn re-register the same tools, so they reuse the validators.
+        """
+        # orjson rather than msgspec, whose sorted-key encoding needs a newer release than the pinned minimum
+        return _compile_schema(orjson.dumps({
+            "type": "object",
+            "properties": tool.parameters,
+            "required": tool.required_params
+        }, option=orjson.OPT_SORT_KEYS))
     
-    def get_tool_schemas(self) -> List[Dict[str, Any]]:
-        """Get schemas for all tools."""
-        return [tool.get_schema() for tool in self.tools]
+    def _validate(self, tool: Tool, kwargs: Dict[str, Any]) -> None:
+        """Check a call's arguments against the tool's compiled parameter schema."""
+        try:
+            self._validators[tool.name](kwargs)
+        except JsonSchemaValueException as e:
+            raise ValueError(f"Invalid arguments for tool {tool.name}: {e.message}") from e
     
-    def add_memory_tools(self, core_memory: CoreMemory) -> None:
+    def _result_key(self, tool: Tool, kwargs: Dict[str, Any]) -> Optional[Tuple[str, FrozenSet[Tuple[str, Any]]]]:
+        """Get the result cache key for a call, or None if its result must not be cached."""
+        if not tool.idempotent or self.result_cache_size <= 0:
+            return None
+        
+        try:
+            key = (tool.name, frozenset(kwargs.items()))
+            hash(key)
+        except TypeError:
+            # Unhashable arguments such as lists cannot be cached
+            return None
+        return key
+    
+    def _remember(self, key: Tuple[str, FrozenSet[Tuple[str, Any]]], result: Any) -> None:
+        """Cache an idempotent tool's result, evicting the least recently used beyond the cache size."""
+        self._results[key] = result
+        while len(self._results) > self.result_cache_size:
+            try:
+                self._results.popitem(last=False)
+            except KeyError:
+                # Another thread emptied the cache first
+                break
+    
+    def mine_meta_tools(self,
+                        bindings: Dict[Tuple[str, str], str],
+                        min_support: int = 5,
+                        max_len: int = 4) -> List[Tool]:
+        """Register meta-tools for tool call sequences that keep recurring in the call trace.
+        
+        A meta-tool runs a whole sequence in one call, passing each step's result to the next,
+        which saves the model a round trip per intermediate step. Only sequences whose every
+        step feeds the next through a binding are merged; its parameters are the union of the
+        steps' parameters minus the bound ones, so steps sharing a parameter name get the same
+        value. Steps with async tools are left out.
+        
+        Args:
+            bindings: (tool, next tool) -> parameter of the next tool that receives the tool's result
+            min_support: Minimum number of times a sequence must occur in the trace
+            max_len: Maximum number of steps in a sequence
+            
+        Returns:
+            The newly registered meta-tools
+        """
+        trace = list(self._trace)
+        counts = Counter(
+            tuple(trace[start:start + length])
+            for length in range(2, max_len + 1)
+            for start in range(len(trace) - length + 1)
+        )
+        
+        candidates = {
+            steps: support for steps, support in counts.items()
+            if support >= min_support
+            and all(step in self.tools_by_name and not self.tools_by_name[step].is_async for step in steps)
+            and all(pair in bindings for pair in zip(steps, steps[1:]))
+        }
+        
+        meta_tools = []
+        for steps, support in candidates.items():
+            if "__".join(steps) in self.tools_by_name:
+                continue
+            # A sequence that only ever occurs inside a longer one is covered by the longer one's meta-tool
+            if any(candidates.get(longer) == support for longer in candidates
+                   if len(longer) == len(steps) + 1 and steps in (longer[1:], longer[:-1])):
+                continue
+            meta_tools.append(self._meta_tool(steps, bindings))
+        
+        for tool in meta_tools:
+            self.register_tool(tool)
+        return meta_tools
+    
+    def _meta_tool(self, steps: Tuple[str, ...], bindings: Dict[Tuple[str, str], str]) -> Tool:
+        """Build a tool that runs a sequence of tools, passing each result to the next through its binding."""
+        tools = [self.tools_by_name[step] for step in steps]
+        bound = {(i + 1, bindings[pair]) for i, pair in enumerate(zip(steps, steps[1:]))}
+        parameters: Dict[str, Dict[str, Any]] = {}
+        required: List[str] = []
+        for i, tool in enumerate(tools):
+            for param, spec in tool.parameters.items():
+                if (i, param) not in bound:
+                    parameters.setdefault(param, spec)
+            required.extend(param for param in tool.required_params
+                            if (i, param) not in bound and param not in required)
+        
+        def run_sequence(**kwargs) -> Any:
+            result = None
+            for i, step in enumerate(steps):
+                tool = self._require_tool(step)
+                args = {param: kwargs[param] for param in tool.parameters if param in kwargs}
+                if i:
+                    args[bindings[(steps[i - 1], step)]] = result
+                result = self._call(tool, args)
+            return result
+        
+        return Tool(
+            name="__".join(steps),
+            description=f"Run {' then '.join(steps)}, passing each result to the next step, and return "
+                        f"the last step's result. Steps: " + "; ".join(f"{tool.name}: {tool.description}" for tool in tools),
+            parameters=parameters,
+            required_params=required,
+            category="meta",
+            function=run_sequence
+        )
+    
+    def get_system_hint(self) -> str:
+        """Get a system prompt snippet telling the model to reuse earlier tool results.
+        
+        Idempotent tools are named individually, since repeating one of their calls can never
+        give a different answer.
+        """
+        lines = [
+            "# Reusing Tool Results",
+            "Before calling a tool, check the results of the tool calls already made in this "
+            "conversation. If an earlier result answers what you need, use it instead of calling "
+            "the tool again."
+        ]
+        lines.extend(
+            f"- Results from {tool.name} with identical arguments are stable: reuse prior outputs."
+            for tool in self.tools_by_name.values() if tool.idempotent
+        )
+        return "\n".join(lines)
+    
+    def get_tool_schemas(self, query: Optional[str] = None, top_k: int = 8) -> List[Dict[str, Any]]:
+        """Get tool schemas, either for all tools or only for those most relevant to a query.
+        
+        Sending only the relevant schemas keeps the prompt short when an agent has many tools.
+        Each schema is built when its tool is registered, and the full list is cached until a
+        tool is registered; both are shared between callers, so they must not be modified.
+        
+        Args:
+            query: Text to rank the tools against, such as the user's message (all tools if None)
+            top_k: Number of tools returned for a query
+            
+        Returns:
+            The schemas, in registration order for all tools or most relevant first for a query
+        """
+        if query is None or self.embedder is None or len(self.tools_by_name) <= top_k:
+            if self._schemas is None:
+                self._schemas = list(self._tool_schemas.values())
+            return self._schemas
+        
+        self._index_tools()
+        vector = self._embed([query])[0]
+        matches = heapq.nlargest(
+            top_k,
+            chain.from_iterable(index.search(vector, top_k) for index in self._leaf_indexes.values()),
+            key=itemgetter(1)
+        )
+        return [self._tool_schemas[name] for name, _ in matches]
+    
+    def retrieve_tools(self, query: str, top_k: int = 8) -> List[Tool]:
+        """Shortlist the tools for a query by walking the tool directory.
+        
+        The query goes to the category, and then the subcategory within it, whose centroid is
+        nearest, and only that subcategory's tools are ranked. This scores a handful of centroids
+        plus one subcategory instead of every tool, at the cost of missing a relevant tool filed
+        under another category.
+        
+        Args:
+            query: Text to rank the tools against, such as the user's message
+            top_k: Maximum number of tools returned
+            
+        Returns:
+            Tools from the nearest subcategory, most relevant first
+        """
+        if self.embedder is None:
+            raise ValueError("retrieve_tools requires an embedder")
+        if not self.tools_by_name:
+            return []
+        
+        self._index_tools()
+        vector = self._embed([query])[0]
+        (category,) = self._nearest([(category,) for category in self._by_category], vector)
+        leaf = self._nearest([(category, subcategory) for subcategory in self._by_category[category]], vector)
+        return [self.tools_by_name[name] for name, _ in self._leaf_indexes[leaf].search(vector, top_k)]
+    
+    def _nearest(self, paths: List[Tuple[str, ...]], vector: np.ndarray) -> Tuple[str, ...]:
+        """Get the directory path whose centroid is most similar to a normalized vector."""
+        if len(paths) == 1:
+            return paths[0]
+        
+        centroids = np.stack([self._centroid_sums[path] for path in paths])
+        norms = np.linalg.norm(centroids, axis=1)
+        norms[norms == 0] = 1.0
+        return paths[int(np.argmax(centroids @ vector / norms))]
+    
+    @staticmethod
+    def _split_category(category: str) -> Tuple[str, str]:
+        """Split a tool category into its category and (possibly empty) subcategory."""
+        category, _, subcategory = category.partition("/")
+        return category, subcategory
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts as L2-normalized float32 rows."""
+        vectors = np.asarray(self.embedder(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def _index_tools(self) -> None:
+        """Embed the tools registered since the last query and add them to the directory centroids."""
+        if sum(len(index) for index in self._leaf_indexes.values()) == len(self.tools_by_name):
+            return
+        
+        from ..memory.vector_index import VectorIndex
+        
+        leaves = defaultdict(list)
+        for tool in self.tools_by_name.values():
+            leaf = self._split_category(tool.category)
+            if tool.name not in self._leaf_indexes.get(leaf, ()):
+                leaves[leaf].append(tool)
+        
+        tools = list(chain.from_iterable(leaves.values()))
+        vectors = self._embed([f"{tool.name}: {tool.description}" for tool in tools])
+        start = 0
+        for leaf, leaf_tools in leaves.items():
+            leaf_vectors = vectors[start:start + len(leaf_tools)]
+            start += len(leaf_tools)
+            self._leaf_indexes.setdefault(leaf, VectorIndex()).add([tool.name for tool in leaf_tools], leaf_vectors)
+            total = leaf_vectors.sum(axis=0)
+            for path in (leaf[:1], leaf):
+                self._centroid_sums[path] = self._centroid_sums.get(path, 0) + total
+    
+    def _unindex_tool(self, tool: Tool) -> None:
+        """Remove a tool from the directory, its embedding index and its centroids."""
+        category, subcategory = leaf = self._split_category(tool.category)
+        subcategories = self._by_category[category]
+        del subcategories[subcategory][tool.name]
+        
+        index = self._leaf_indexes.get(leaf)
+        vector = None if index is None else index.get(tool.name)
+        if vector is not None:
+            index.remove(tool.name)
+            for path in (leaf[:1], leaf):
+                self._centroid_sums[path] = self._centroid_sums[path] - vector
+        
+        # Drop emptied branches so routing never lands on a category without tools
+        if not subcategories[subcategory]:
+            del subcategories[subcategory]
+            self._leaf_indexes.pop(leaf, None)
+            self._centroid_sums.pop(leaf, None)
+        if not subcategories:
+            del self._by_category[category]
+            self._centroid_sums.pop(leaf[:1], None)
+    
+    def add_memory_tools(self, core_memory: "CoreMemory") -> None:
         """Add default memory management tools."""
         # Core memory tools
         self.register_tool(Tool(
@@ -55,7 +611,7 @@ class ToolManager(BaseModel):
                 "value": {"type": "string", "description": "Content to store in the memory block"}
             },
             required_params=["key", "value"],
-            function=lambda key, value: core_memory.add_or_update(key, value)
+            function=core_memory.add_or_update
         ))
         
         self.register_tool(Tool(
@@ -65,7 +621,31 @@ class ToolManager(BaseModel):
                 "key": {"type": "string", "description": "Key for the memory block to retrieve"}
             },
             required_params=["key"],
-            function=lambda key: core_memory.get(key)
+            function=core_memory.get
+        ))
+        
+        self.register_tool(Tool(
+            name="core_memory_add_many",
+            description="Add or update several core memory blocks in one call",
+            parameters={
+                "blocks": {
+                    "type": "object",
+                    "additionalProperties": {"type": "string"},
+                    "description": "Content to store, keyed by memory block key"
+                }
+            },
+            required_params=["blocks"],
+            function=core_memory.add_many
+        ))
+        
+        self.register_tool(Tool(
+            name="core_memory_get_many",
+            description="Get several core memory blocks by key in one call",
+            parameters={
+                "keys": {"type": "array", "items": {"type": "string"}, "description": "Keys of the memory blocks to retrieve"}
+            },
+            required_params=["keys"],
+            function=core_memory.get_many
         ))
         
         self.register_tool(Tool(
@@ -75,7 +655,30 @@ class ToolManager(BaseModel):
                 "key": {"type": "string", "description": "Key for the memory block to delete"}
             },
             required_params=["key"],
-            function=lambda key: core_memory.delete(key)
+            function=core_memory.delete
         ))
         
-        # TODO: Add archival memory and recall memory tools
+        # TODO: Add an archival memory insert tool
+    
+    def add_memory_search_tool(self, memory_manager: "MemoryManager") -> None:
+        """Add the memory_search tool, which retrieves archival or recall memory matching a query.
+        
+        Retrieved memory reaches the model only as tool results rather than in the system
+        prompt, so the prompt prefix stays the same across turns and remains cacheable.
+        """
+        def memory_search(query: str, source: str = "archival", limit: int = 5) -> List[Dict[str, Any]]:
+            if source == "recall":
+                return [msgspec.to_builtins(message) for message in memory_manager.get_relevant_recall(query, limit)]
+            return memory_manager.search_archival(query, limit)
+        
+        self.register_tool(Tool(
+            name="memory_search",
+            description="Search archival memory (stored knowledge) or recall memory (past conversation) for a query",
+            parameters={
+                "query": {"type": "string", "description": "Text to search for"},
+                "source": {"type": "string", "enum": ["archival", "recall"], "description": "Memory to search (default archival)"},
+                "limit": {"type": "integer", "description": "Maximum number of results (default 5)"}
+            },
+            required_params=["query"],
+            function=memory_search
+        ))